@@ -3,37 +3,59 @@ from __future__ import annotations
 import time
 from collections import OrderedDict
 from threading import Lock
+from typing import TYPE_CHECKING, Generic, TypeVar
 
+if TYPE_CHECKING:
+    from .generators import Mesh
 
-class LRUCache:
-    """In-memory LRU cache for STL bytes.
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """In-memory LRU cache, used for STL bytes and parsed meshes.
 
     Gridfinity STLs are typically 200KB-2MB.
     100 entries ~= 200MB worst case. Fine for local dev.
+
+    Recency is tracked in an OrderedDict: a hit or a rewrite moves the key
+    to the end with ``move_to_end``, so the first key is always the least
+    recently used. A live key is never removed and re-inserted, so the
+    lock-free reads in ``get`` cannot miss it mid-update.
     """
 
     def __init__(self, max_entries: int = 100, ttl_seconds: int = 3600):
-        self._cache: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._cache: OrderedDict[str, tuple[float, V]] = OrderedDict()
         self._max = max_entries
         self._ttl = ttl_seconds
         self._lock = Lock()
 
-    def get(self, key: str) -> bytes | None:
-        with self._lock:
-            if key not in self._cache:
-                return None
-            ts, data = self._cache[key]
-            if time.time() - ts > self._ttl:
-                del self._cache[key]
-                return None
-            self._cache.move_to_end(key)
-            return data
+    def get(self, key: str) -> V | None:
+        # Hits are served without taking the lock: a single dict lookup is
+        # atomic under the GIL, and a key only leaves the dict when it is
+        # evicted, expired or cleared.
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        ts, data = entry
+        if time.time() - ts > self._ttl:
+            with self._lock:
+                if self._cache.get(key) is entry:
+                    del self._cache[key]
+            return None
+        # The recency bump is best-effort: if a writer holds the lock, skip
+        # it rather than wait. Worst case the entry is evicted a little early.
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._cache.get(key) is entry:
+                    self._cache.move_to_end(key)
+            finally:
+                self._lock.release()
+        return data
 
-    def set(self, key: str, data: bytes) -> None:
+    def set(self, key: str, data: V) -> None:
         with self._lock:
-            if key in self._cache:
-                self._cache.move_to_end(key)
             self._cache[key] = (time.time(), data)
+            self._cache.move_to_end(key)
             while len(self._cache) > self._max:
                 self._cache.popitem(last=False)
 
@@ -42,4 +64,8 @@ class LRUCache:
             self._cache.clear()
 
 
-stl_cache = LRUCache()
+stl_cache: LRUCache[bytes] = LRUCache()
+
+# Parsed (vertices, triangles) per STL cache key, so repeated 3MF plates
+# skip the STL parse and vertex dedup as well as CadQuery.
+mesh_cache: LRUCache[Mesh] = LRUCache()
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
+import functools
 import os
 import platform
 from dataclasses import dataclass
 
+_ENV_BOOL_TRUE = frozenset({"1", "true", "yes"})
+_ENV_BOOL_FALSE = frozenset({"0", "false", "no"})
 
+
+@functools.lru_cache(maxsize=1)
 def _is_mac() -> bool:
     return platform.system() == "Darwin"
 
 
 def _env_bool(key: str, default: bool) -> bool:
     val = os.environ.get(key, "").lower()
-    if val in ("1", "true", "yes"):
+    if val in _ENV_BOOL_TRUE:
         return True
-    if val in ("0", "false", "no"):
+    if val in _ENV_BOOL_FALSE:
         return False
     return default
 
@@ -33,10 +38,24 @@ class ServerConfig:
     rate_limit_concurrent_jobs: int
     rate_limit_daily_total: int
     job_max_age_seconds: int
+    # Deflate level for plate ZIPs of STLs; 0 stores them uncompressed
+    plate_zip_level: int = 1
+    # Share one 3MF object between identical meshes with different cache keys
+    threemf_dedup_geometry: bool = True
 
 
+@functools.lru_cache(maxsize=1)
 def load_config() -> ServerConfig:
+    """Read the server config from the environment (once per process).
+
+    Call ``load_config.cache_clear()`` to pick up environment changes.
+    """
     mac = _is_mac()
+    # Both zlib and libdeflate take 0-9; a bad level would otherwise only
+    # surface as every plate job failing
+    plate_zip_level = _env_int("GRID_PLATE_ZIP_LEVEL", 1)
+    if not 0 <= plate_zip_level <= 9:
+        raise ValueError(f"GRID_PLATE_ZIP_LEVEL must be 0-9, got {plate_zip_level}")
     return ServerConfig(
         worker_pool_size=_env_int("GRID_WORKER_POOL_SIZE", 2),
         rate_limit_enabled=_env_bool("GRID_RATE_LIMIT_ENABLED", not mac),
@@ -44,4 +63,6 @@ def load_config() -> ServerConfig:
         rate_limit_concurrent_jobs=_env_int("GRID_RATE_LIMIT_CONCURRENT_JOBS", 4),
         rate_limit_daily_total=_env_int("GRID_RATE_LIMIT_DAILY_TOTAL", 500),
         job_max_age_seconds=_env_int("GRID_JOB_MAX_AGE_SECONDS", 3600),
+        plate_zip_level=plate_zip_level,
+        threemf_dedup_geometry=_env_bool("GRID_3MF_DEDUP_GEOMETRY", True),
     )
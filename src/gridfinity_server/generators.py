@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import functools
 import logging
+import os
 import re
+import struct
 import tempfile
-from pathlib import Path
+from typing import Union
 
 from cqgridfinity import GridfinityBox, GridfinityBaseplate
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - cadquery normally pulls numpy in
+    np = None
+
 from .schemas import BinRequest, BaseplateRequest
 
 logger = logging.getLogger(__name__)
@@ -48,18 +56,127 @@ def generate_baseplate_stl(req: BaseplateRequest) -> bytes:
 
 
 def _obj_to_stl_bytes(obj) -> bytes:
-    """Extract STL bytes from a rendered cq-gridfinity object."""
-    with tempfile.NamedTemporaryFile(suffix=".stl", delete=True) as tmp:
-        obj.save_stl_file(filename=tmp.name)
-        return Path(tmp.name).read_bytes()
+    """Extract binary STL bytes from a rendered cq-gridfinity object."""
+    # OCCT's STL writer only takes a path, so a temp file is unavoidable.
+    # Keep our own descriptor open and read the result back through it
+    # instead of reopening the file by name.
+    fd, path = tempfile.mkstemp(suffix=".stl")
+    try:
+        # Same tessellation settings as cq-gridfinity's save_stl_file(),
+        # which can only write ASCII.
+        obj.cq_obj.val().exportStl(
+            path, tolerance=1e-2, angularTolerance=0.1, ascii=False
+        )
+        with open(fd, "rb", closefd=False) as f:
+            return f.read()
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+
+# Meshes are (N, 3) float32 vertex and (T, 3) int32 triangle arrays; the
+# pure-Python fallbacks used without NumPy return lists of tuples instead.
+Vertices = Union["np.ndarray", list[tuple[float, float, float]]]
+Triangles = Union["np.ndarray", list[tuple[int, int, int]]]
+Mesh = tuple[Vertices, Triangles]
+
+# Binary STL record: normal, three vertices, attribute byte count (50 bytes)
+_STL_FACET_FORMAT = "<12fH"
+if np is not None:
+    _STL_FACET = np.dtype([("n", "<f4", (3,)), ("v", "<f4", (3, 3)), ("attr", "<u2")])
+
+
+def parse_stl_to_mesh(stl_bytes: bytes) -> Mesh:
+    """Parse binary or ASCII STL → (vertices, triangles) with deduplication."""
+    if _is_binary_stl(stl_bytes):
+        return _parse_binary_stl(stl_bytes)
+    return _parse_ascii_stl(stl_bytes)
+
+
+def _is_binary_stl(buf: bytes) -> bool:
+    # The header is free-form and may itself start with "solid", so trust the
+    # facet count rather than the first bytes.
+    if len(buf) < 84:
+        return False
+    count = int.from_bytes(buf[80:84], "little")
+    return len(buf) == 84 + count * 50
+
+
+def _parse_binary_stl(buf: bytes) -> Mesh:
+    count = int.from_bytes(buf[80:84], "little")
+    if np is None:
+        return _parse_binary_stl_struct(buf, count)
+    facets = np.frombuffer(buf, dtype=_STL_FACET, count=count, offset=84)
+    return _dedup_vertices(facets["v"].reshape(-1, 3).astype(np.float64))
+
+
+# Vertex keys pack quantized coordinates into one int. Each lane holds a
+# signed value below 2**31 in magnitude (±214 m at 0.0001 mm), so the
+# packing is exact.
+_KEY_LANE = 1 << 32
+
+
+def _dedup_vertices(verts: np.ndarray) -> Mesh:
+    """Merge an (N, 3) float64 array of triangle corners into an indexed mesh."""
+    if not len(verts):
+        return np.empty((0, 3), np.float32), np.empty((0, 3), np.int32)
+    # Quantize to 0.0001 mm (the same classes as np.round(verts, 4), and
+    # -0.0 falls into 0) and sort on two int64 keys, x/y packed together and
+    # z. Plain integer sorts are several times faster than np.unique over
+    # whole rows; equal vertices end up adjacent either way.
+    q = np.rint(verts * 10000).astype(np.int64)
+    xy = q[:, 0] * _KEY_LANE + q[:, 1]
+    z = q[:, 2]
+    order = np.lexsort((z, xy))
+    xy, z = xy[order], z[order]
+    first = np.empty(len(order), dtype=bool)
+    first[0] = True
+    np.not_equal(xy[1:], xy[:-1], out=first[1:])
+    first[1:] |= z[1:] != z[:-1]
+    inverse = np.empty(len(order), dtype=np.int32)
+    inverse[order] = np.cumsum(first, dtype=np.int32) - 1
+    vertices = (q[order[first]] / 10000).astype(np.float32)
+    return vertices, inverse.reshape(-1, 3)
+
+
+def _parse_binary_stl_struct(buf: bytes, count: int) -> Mesh:
+    """Pure-Python fallback for _parse_binary_stl when NumPy is unavailable."""
+    vert_map: dict[int, int] = {}
+    vertices: list[tuple[float, float, float]] = []
+    triangles: list[tuple[int, int, int]] = []
+    lookup = vert_map.get
+
+    payload = memoryview(buf)[84:84 + count * 50]
+    for facet in struct.iter_unpack(_STL_FACET_FORMAT, payload):
+        tri = []
+        for i in (3, 6, 9):
+            # Quantize to 0.0001 mm and key on a single int: one object per
+            # vertex instead of a tuple of three, and cheaper to hash.
+            ix = round(facet[i] * 10000)
+            iy = round(facet[i + 1] * 10000)
+            iz = round(facet[i + 2] * 10000)
+            key = (ix * _KEY_LANE + iy) * _KEY_LANE + iz
+            idx = lookup(key)
+            if idx is None:
+                idx = vert_map[key] = len(vertices)
+                vertices.append((ix / 10000, iy / 10000, iz / 10000))
+            tri.append(idx)
+        triangles.append((tri[0], tri[1], tri[2]))
+
+    return vertices, triangles
+
 
+_ASCII_VERTEX = re.compile(rb"vertex\s+([\d.eE+-]+)\s+([\d.eE+-]+)\s+([\d.eE+-]+)")
 
-def parse_stl_to_mesh(
-    stl_bytes: bytes,
-) -> tuple[list[tuple[float, float, float]], list[tuple[int, int, int]]]:
-    """Parse ASCII STL → (vertices, triangles) with deduplication."""
-    text = stl_bytes.decode("ascii", errors="replace")
-    raw_verts = re.findall(r"vertex\s+([\d.eE+-]+)\s+([\d.eE+-]+)\s+([\d.eE+-]+)", text)
+
+def _parse_ascii_stl(stl_bytes: bytes) -> Mesh:
+    raw_verts = _ASCII_VERTEX.findall(stl_bytes)
+    if np is not None:
+        # Let NumPy parse the number tokens and reuse the binary dedup.
+        # A trailing partial facet is ignored.
+        usable = len(raw_verts) - len(raw_verts) % 3
+        verts = np.array(raw_verts[:usable], dtype=np.float64).reshape(-1, 3)
+        return _dedup_vertices(verts)
 
     vert_map: dict[tuple[float, float, float], int] = {}
     vertices: list[tuple[float, float, float]] = []
@@ -82,15 +199,33 @@ def parse_stl_to_mesh(
 def bin_filename(req: BinRequest, index: int | None = None) -> str:
     """Generate a descriptive filename for a bin STL."""
     parts = [f"bin-{req.width}x{req.depth}x{req.height}", req.type]
-    if req.label:
-        safe = "".join(c for c in req.label if c.isalnum() or c in "-_ ")[:20].strip()
-        if safe:
-            parts.append(safe)
+    safe = _safe_label(req.label)
+    if safe:
+        parts.append(safe)
     if index is not None:
         parts.append(str(index))
     return "-".join(parts) + ".stl"
 
 
+# Deletes every ASCII character that is not alphanumeric or one of "-_ ".
+_LABEL_TRANS = str.maketrans(
+    "", "", "".join(c for c in map(chr, range(128)) if not (c.isalnum() or c in "-_ "))
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _safe_label(label: str | None) -> str:
+    """Filename-safe form of a bin label (at most 20 chars, may be empty)."""
+    if not label:
+        return ""
+    if label.isascii():
+        safe = label.translate(_LABEL_TRANS)
+    else:
+        # str.isalnum() also accepts non-ASCII letters and digits.
+        safe = "".join(c for c in label if c.isalnum() or c in "-_ ")
+    return safe[:20].strip()
+
+
 def baseplate_filename(req: BaseplateRequest) -> str:
     """Generate a descriptive filename for a baseplate STL."""
     return f"baseplate-{req.grid_width}x{req.grid_depth}.stl"
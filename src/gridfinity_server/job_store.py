@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import shutil
+import tempfile
 import time
 import uuid
+from collections import defaultdict
 from dataclasses import dataclass, field
 from enum import Enum
+from pathlib import Path
 from threading import Lock
 
 
@@ -14,30 +18,87 @@ class JobStatus(str, Enum):
     FAILED = "failed"
 
 
+_ACTIVE_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING)
+
+
 @dataclass
 class JobRecord:
     job_id: str
     job_type: str  # "bin", "baseplate", "plate"
     status: JobStatus = JobStatus.PENDING
     created_at: float = field(default_factory=time.time)
-    result_bytes: bytes | None = None
+    result_path: Path | None = None
     result_filename: str | None = None
     result_media_type: str = "application/octet-stream"
     error: str | None = None
     client_ip: str = ""
 
+    @property
+    def result_bytes(self) -> bytes | None:
+        """Read the result back from disk (None until the job completes)."""
+        if self.result_path is None:
+            return None
+        return self.result_path.read_bytes()
+
 
 class JobStore:
+    """Tracks async jobs. Finished results are spilled to files in
+    ``result_dir`` so that up to MAX_JOBS multi-MB results don't sit on the
+    heap; they are deleted together with their job, and all at once by
+    ``close``.
+
+    Without a ``result_dir`` the store makes a private temp directory on
+    first use and ``close`` removes it.
+    """
+
     MAX_JOBS = 200
 
-    def __init__(self, max_age_seconds: int = 3600):
+    def __init__(self, max_age_seconds: int = 3600, result_dir: str | Path | None = None):
         self._jobs: dict[str, JobRecord] = {}
         self._lock = Lock()
         self._max_age = max_age_seconds
+        self._result_dir = Path(result_dir) if result_dir is not None else None
+        self._owns_result_dir = result_dir is None
+        self._closed = False
+        # Running counts of pending/running jobs, kept in step with _jobs
+        self._active_total = 0
+        self._active_per_ip: dict[str, int] = defaultdict(int)
 
     def create(self, job_type: str, client_ip: str = "") -> JobRecord:
         job_id = uuid.uuid4().hex[:12]
         record = JobRecord(job_id=job_id, job_type=job_type, client_ip=client_ip)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job_id] = record
+            self._active_total += 1
+            self._active_per_ip[client_ip] += 1
+        return record
+
+    def create_complete(
+        self,
+        job_type: str,
+        client_ip: str,
+        result_bytes: bytes,
+        filename: str,
+        media_type: str = "application/octet-stream",
+    ) -> JobRecord:
+        """Add a job that is already finished, e.g. served from a cache.
+
+        Same end state as ``create`` then ``set_complete``, in one lock
+        acquisition; the job never counts as active.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        path = self.result_dir / f"gridfinity-{job_id}.bin"
+        path.write_bytes(result_bytes)
+        record = JobRecord(
+            job_id=job_id,
+            job_type=job_type,
+            status=JobStatus.COMPLETE,
+            result_path=path,
+            result_filename=filename,
+            result_media_type=media_type,
+            client_ip=client_ip,
+        )
         with self._lock:
             self._purge_expired()
             self._jobs[job_id] = record
@@ -49,7 +110,7 @@ class JobStore:
             if record is None:
                 return None
             if self._is_expired(record):
-                del self._jobs[job_id]
+                self._remove(job_id)
                 return None
             return record
 
@@ -62,50 +123,109 @@ class JobStore:
     def set_complete(
         self,
         job_id: str,
-        result_bytes: bytes,
+        result_bytes: bytes | None,
         filename: str,
         media_type: str = "application/octet-stream",
+        result_path: Path | None = None,
     ) -> None:
+        """Record a finished job.
+
+        The result is either ``result_bytes``, written to a file here, or a
+        file the worker already wrote (``result_path``), which the store
+        then owns and deletes with the job.
+        """
+        if result_path is not None:
+            path = result_path
+        elif self._closed:
+            return
+        else:
+            # Write outside the lock; only the record update needs it.
+            path = self.result_dir / f"gridfinity-{job_id}.bin"
+            path.write_bytes(result_bytes)
         with self._lock:
-            record = self._jobs.get(job_id)
+            record = None if self._closed else self._jobs.get(job_id)
             if record:
+                self._deactivate(record)
                 record.status = JobStatus.COMPLETE
-                record.result_bytes = result_bytes
+                record.result_path = path
                 record.result_filename = filename
                 record.result_media_type = media_type
+                return
+        path.unlink(missing_ok=True)
 
     def set_failed(self, job_id: str, error: str) -> None:
         with self._lock:
             record = self._jobs.get(job_id)
             if record:
+                self._deactivate(record)
                 record.status = JobStatus.FAILED
                 record.error = error
 
+    def reset(self) -> None:
+        """Drop every job (and its result file) in place, keeping the store."""
+        with self._lock:
+            for record in self._jobs.values():
+                if record.result_path is not None:
+                    record.result_path.unlink(missing_ok=True)
+            self._jobs.clear()
+            self._active_total = 0
+            self._active_per_ip.clear()
+
+    def close(self) -> None:
+        """Drop every job and delete the result files, with the private
+        result directory if the store made one. Results that finish later
+        are discarded; call at shutdown."""
+        self.reset()
+        with self._lock:
+            self._closed = True
+            if self._owns_result_dir and self._result_dir is not None:
+                # Also takes files of jobs that never reached set_complete
+                shutil.rmtree(self._result_dir, ignore_errors=True)
+
+    @property
+    def result_dir(self) -> Path:
+        """Directory for result files; workers may write theirs here too."""
+        with self._lock:
+            if self._result_dir is None:
+                self._result_dir = Path(tempfile.mkdtemp(prefix="gridfinity-"))
+            return self._result_dir
+
     def active_count(self, client_ip: str | None = None) -> int:
         with self._lock:
-            active = [
-                j
-                for j in self._jobs.values()
-                if j.status in (JobStatus.PENDING, JobStatus.RUNNING)
-                and not self._is_expired(j)
-            ]
+            self._purge_expired()
             if client_ip is not None:
-                active = [j for j in active if j.client_ip == client_ip]
-            return len(active)
+                return self._active_per_ip.get(client_ip, 0)
+            return self._active_total
 
     def _is_expired(self, record: JobRecord) -> bool:
         return time.time() - record.created_at > self._max_age
 
     def _purge_expired(self) -> None:
-        now = time.time()
-        expired = [
-            jid
-            for jid, rec in self._jobs.items()
-            if now - rec.created_at > self._max_age
-        ]
-        for jid in expired:
-            del self._jobs[jid]
+        # Jobs are inserted as they are created, so dict order is age order:
+        # the first entry is always the oldest and the scan can stop at the
+        # first job that is still fresh.
+        while self._jobs:
+            oldest = next(iter(self._jobs))
+            if not self._is_expired(self._jobs[oldest]):
+                break
+            self._remove(oldest)
         # Cap total entries
         while len(self._jobs) > self.MAX_JOBS:
-            oldest = min(self._jobs, key=lambda k: self._jobs[k].created_at)
-            del self._jobs[oldest]
+            self._remove(next(iter(self._jobs)))
+
+    def _remove(self, job_id: str) -> None:
+        record = self._jobs.pop(job_id)
+        self._deactivate(record)
+        if record.result_path is not None:
+            record.result_path.unlink(missing_ok=True)
+
+    def _deactivate(self, record: JobRecord) -> None:
+        """Drop a pending/running record from the active counts."""
+        if record.status not in _ACTIVE_STATUSES:
+            return
+        self._active_total -= 1
+        remaining = self._active_per_ip[record.client_ip] - 1
+        if remaining:
+            self._active_per_ip[record.client_ip] = remaining
+        else:
+            del self._active_per_ip[record.client_ip]
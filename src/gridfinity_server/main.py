@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
-import io
-import json
 import logging
-import zipfile
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+import orjson
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
 
-from .cache import stl_cache
+from .cache import mesh_cache, stl_cache
 from .config import load_config
 from .generators import (
+    Mesh,
+    Triangles,
+    Vertices,
     generate_baseplate_stl,
     generate_bin_stl,
     baseplate_filename,
@@ -29,12 +32,14 @@ from .schemas import (
     JobStatusResponse,
     JobSubmitResponse,
     Plate3MFRequest,
+    PlateItem3MF,
     PlateItemBaseplateData,
     PlateItemBinData,
     PlateRequest,
 )
 from .threemf import build_3mf
 from .worker import WorkerPool
+from .zipwriter import ZipBuilder
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -44,11 +49,18 @@ job_store = JobStore(max_age_seconds=config.job_max_age_seconds)
 worker_pool = WorkerPool(config, job_store)
 
 
+def get_worker_pool(request: Request) -> WorkerPool:
+    """Job endpoints' pool, as a dependency so tests can swap in a fake."""
+    return request.app.state.worker_pool
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    app.state.worker_pool = worker_pool
     worker_pool.start()
     yield
     worker_pool.shutdown()
+    job_store.close()
 
 
 app = FastAPI(title="Gridfinity STL Server", version="0.1.0", lifespan=lifespan)
@@ -69,12 +81,17 @@ app.add_middleware(
 )
 
 
-# --- Existing sync endpoints (unchanged) ---
+# --- Sync endpoints ---
+
+
+# The health payload never changes, so encode it once. response_model is
+# kept for the OpenAPI schema.
+_HEALTH_JSON = orjson.dumps(HealthResponse(version=app.version).model_dump())
 
 
 @app.get("/api/health", response_model=HealthResponse)
 async def health():
-    return HealthResponse(version=app.version)
+    return Response(content=_HEALTH_JSON, media_type="application/json")
 
 
 @app.post("/api/bin/stl")
@@ -112,49 +129,23 @@ async def generate_baseplate(req: BaseplateRequest):
 @app.post("/api/plate/stl")
 async def generate_plate(req: PlateRequest):
     """Generate a ZIP of STL files for all items on a build plate."""
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for i, item in enumerate(req.items):
-            if item.bin_data is None:
-                continue
-
-            if isinstance(item.bin_data, PlateItemBinData):
-                bin_req = BinRequest(
-                    width=item.bin_data.width,
-                    depth=item.bin_data.depth,
-                    height=item.bin_data.height,
-                    type=item.bin_data.type,
-                    wall_thickness=item.bin_data.wall_thickness,
-                    dividers=item.bin_data.dividers,
-                    magnets=item.bin_data.magnets,
-                    stackable=item.bin_data.stackable,
-                    finger_grabs=item.bin_data.finger_grabs,
-                    label=item.bin_data.label,
-                )
-                cache_key = _cache_key("bin", bin_req)
-                stl_bytes = stl_cache.get(cache_key)
-                if stl_bytes is None:
-                    stl_bytes = generate_bin_stl(bin_req)
-                    stl_cache.set(cache_key, stl_bytes)
-                zf.writestr(bin_filename(bin_req, index=i), stl_bytes)
-
-            elif isinstance(item.bin_data, PlateItemBaseplateData):
-                bp_req = BaseplateRequest(
-                    grid_width=item.bin_data.grid_width,
-                    grid_depth=item.bin_data.grid_depth,
-                    has_magnets=item.bin_data.has_magnets,
-                )
-                cache_key = _cache_key("baseplate", bp_req)
-                stl_bytes = stl_cache.get(cache_key)
-                if stl_bytes is None:
-                    stl_bytes = generate_baseplate_stl(bp_req)
-                    stl_cache.set(cache_key, stl_bytes)
-                zf.writestr(baseplate_filename(bp_req), stl_bytes)
-
-    zip_buffer.seek(0)
+    planned: list[tuple[str, str, BinRequest | BaseplateRequest]] = []
+    for i, item in enumerate(req.items):
+        resolved = _plate_item_request(item.bin_data)
+        if resolved is None:
+            continue
+        cache_key, item_req = resolved
+        if isinstance(item_req, BinRequest):
+            fname = bin_filename(item_req, index=i)
+        else:
+            fname = baseplate_filename(item_req)
+        planned.append((fname, cache_key, item_req))
+
+    stl_by_key = await _resolve_stls([(key, r) for _, key, r in planned])
+    entries = [(fname, stl_by_key[key]) for fname, key, _ in planned]
+
     return StreamingResponse(
-        zip_buffer,
+        _stream_zip(entries),
         media_type="application/zip",
         headers={"Content-Disposition": f'attachment; filename="{req.name}.zip"'},
     )
@@ -163,52 +154,40 @@ async def generate_plate(req: PlateRequest):
 @app.post("/api/plate/3mf")
 async def generate_plate_3mf(req: Plate3MFRequest):
     """Generate a 3MF file with all items positioned on the build plate."""
-    meshes: list[tuple[str, list, list]] = []
-    placements: list[tuple[str, float, float, float]] = []
-    seen_keys: set[str] = set()
-
+    planned: list[tuple[str, BinRequest | BaseplateRequest, PlateItem3MF]] = []
     for item in req.items:
-        if isinstance(item.bin_data, PlateItemBinData):
-            bin_req = BinRequest(
-                width=item.bin_data.width,
-                depth=item.bin_data.depth,
-                height=item.bin_data.height,
-                type=item.bin_data.type,
-                wall_thickness=item.bin_data.wall_thickness,
-                dividers=item.bin_data.dividers,
-                magnets=item.bin_data.magnets,
-                stackable=item.bin_data.stackable,
-                finger_grabs=item.bin_data.finger_grabs,
-                label=item.bin_data.label,
-            )
-            cache_key = _cache_key("bin", bin_req)
-            stl_bytes = stl_cache.get(cache_key)
-            if stl_bytes is None:
-                stl_bytes = generate_bin_stl(bin_req)
-                stl_cache.set(cache_key, stl_bytes)
-        elif isinstance(item.bin_data, PlateItemBaseplateData):
-            bp_req = BaseplateRequest(
-                grid_width=item.bin_data.grid_width,
-                grid_depth=item.bin_data.grid_depth,
-                has_magnets=item.bin_data.has_magnets,
-            )
-            cache_key = _cache_key("baseplate", bp_req)
-            stl_bytes = stl_cache.get(cache_key)
-            if stl_bytes is None:
-                stl_bytes = generate_baseplate_stl(bp_req)
-                stl_cache.set(cache_key, stl_bytes)
-        else:
+        resolved = _plate_item_request(item.bin_data)
+        if resolved is None:
             continue
+        cache_key, item_req = resolved
+        planned.append((cache_key, item_req, item))
+
+    # Parsed meshes first: a mesh-cache hit needs no STL, even if the STL
+    # itself has since been evicted from stl_cache
+    mesh_by_key: dict[str, Mesh | None] = {}
+    for cache_key, _, _ in planned:
+        if cache_key not in mesh_by_key:
+            mesh_by_key[cache_key] = mesh_cache.get(cache_key)
+    stl_by_key = await _resolve_stls(
+        [(key, r) for key, r, _ in planned if mesh_by_key[key] is None]
+    )
 
-        if cache_key not in seen_keys:
-            verts, tris = parse_stl_to_mesh(stl_bytes)
-            meshes.append((cache_key, verts, tris))
-            seen_keys.add(cache_key)
+    meshes: list[tuple[str, Vertices, Triangles]] = []
+    placements: list[tuple[str, float, float, float]] = []
+
+    for cache_key, mesh in mesh_by_key.items():
+        if mesh is None:
+            mesh = parse_stl_to_mesh(stl_by_key[cache_key])
+            mesh_cache.set(cache_key, mesh)
+        verts, tris = mesh
+        meshes.append((cache_key, verts, tris))
 
+    for cache_key, _, item in planned:
         placements.append((cache_key, item.x_mm, item.y_mm, item.rotation))
 
     threemf_bytes = build_3mf(
         req.name, meshes, placements, req.bed_width_mm, req.bed_depth_mm,
+        dedup_geometry=config.threemf_dedup_geometry,
     )
     return Response(
         content=threemf_bytes,
@@ -221,65 +200,55 @@ async def generate_plate_3mf(req: Plate3MFRequest):
 
 
 @app.post("/api/jobs/bin", response_model=JobSubmitResponse, status_code=202)
-async def submit_bin_job(req: BinRequest, request: Request):
+async def submit_bin_job(
+    req: BinRequest, request: Request, pool: WorkerPool = Depends(get_worker_pool)
+):
     cache_key = _cache_key("bin", req)
     stl_bytes = stl_cache.get(cache_key)
     if stl_bytes is not None:
-        fname = bin_filename(req)
-        job = job_store.create("bin", client_ip=_client_ip(request))
-        job_store.set_complete(job.job_id, stl_bytes, fname)
-        return JSONResponse(
-            content={"jobId": job.job_id, "status": "complete"},
-            status_code=200,
+        job = job_store.create_complete(
+            "bin", _client_ip(request), stl_bytes, bin_filename(req)
         )
+        return _job_response(job.job_id, "complete", status_code=200)
 
     job = job_store.create("bin", client_ip=_client_ip(request))
-    worker_pool.submit_bin(job.job_id, req.model_dump(), cache_key)
-    return JSONResponse(
-        content={"jobId": job.job_id, "status": "pending"},
-        status_code=202,
-    )
+    pool.submit_bin(job.job_id, dict(req), cache_key)
+    return _job_response(job.job_id, "pending", status_code=202)
 
 
 @app.post("/api/jobs/baseplate", response_model=JobSubmitResponse, status_code=202)
-async def submit_baseplate_job(req: BaseplateRequest, request: Request):
+async def submit_baseplate_job(
+    req: BaseplateRequest, request: Request, pool: WorkerPool = Depends(get_worker_pool)
+):
     cache_key = _cache_key("baseplate", req)
     stl_bytes = stl_cache.get(cache_key)
     if stl_bytes is not None:
-        fname = baseplate_filename(req)
-        job = job_store.create("baseplate", client_ip=_client_ip(request))
-        job_store.set_complete(job.job_id, stl_bytes, fname)
-        return JSONResponse(
-            content={"jobId": job.job_id, "status": "complete"},
-            status_code=200,
+        job = job_store.create_complete(
+            "baseplate", _client_ip(request), stl_bytes, baseplate_filename(req)
         )
+        return _job_response(job.job_id, "complete", status_code=200)
 
     job = job_store.create("baseplate", client_ip=_client_ip(request))
-    worker_pool.submit_baseplate(job.job_id, req.model_dump(), cache_key)
-    return JSONResponse(
-        content={"jobId": job.job_id, "status": "pending"},
-        status_code=202,
-    )
+    pool.submit_baseplate(job.job_id, dict(req), cache_key)
+    return _job_response(job.job_id, "pending", status_code=202)
 
 
 @app.post("/api/jobs/plate", response_model=JobSubmitResponse, status_code=202)
-async def submit_plate_job(req: PlateRequest, request: Request):
+async def submit_plate_job(
+    req: PlateRequest, request: Request, pool: WorkerPool = Depends(get_worker_pool)
+):
     job = job_store.create("plate", client_ip=_client_ip(request))
-    worker_pool.submit_plate(job.job_id, req.model_dump())
-    return JSONResponse(
-        content={"jobId": job.job_id, "status": "pending"},
-        status_code=202,
-    )
+    pool.submit_plate(job.job_id, req.model_dump())
+    return _job_response(job.job_id, "pending", status_code=202)
 
 
 @app.post("/api/jobs/plate-3mf", response_model=JobSubmitResponse, status_code=202)
-async def submit_plate_3mf_job(req: Plate3MFRequest, request: Request):
+async def submit_plate_3mf_job(
+    req: Plate3MFRequest, request: Request, pool: WorkerPool = Depends(get_worker_pool)
+):
     job = job_store.create("plate-3mf", client_ip=_client_ip(request))
-    worker_pool.submit_plate_3mf(job.job_id, req.model_dump())
-    return JSONResponse(
-        content={"jobId": job.job_id, "status": "pending"},
-        status_code=202,
-    )
+    pool.submit_plate_3mf(job.job_id, req.model_dump())
+    return _job_response(job.job_id, "pending", status_code=202)
 
 
 @app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
@@ -295,7 +264,9 @@ async def get_job_status(job_id: str):
         result["resultUrl"] = f"/api/jobs/{job.job_id}/result"
     if job.status == JobStatus.FAILED:
         result["error"] = job.error
-    return JSONResponse(content=result)
+    # Clients poll this endpoint; orjson renders the same compact UTF-8
+    # JSON as JSONResponse, a few times faster
+    return Response(content=orjson.dumps(result), media_type="application/json")
 
 
 @app.get("/api/jobs/{job_id}/result")
@@ -311,8 +282,8 @@ async def get_job_result(job_id: str):
             status_code=409,
         )
 
-    return Response(
-        content=job.result_bytes,
+    return FileResponse(
+        job.result_path,
         media_type=job.result_media_type,
         headers={
             "Content-Disposition": f'attachment; filename="{job.result_filename}"'
@@ -327,7 +298,7 @@ async def get_job_result(job_id: str):
 async def general_exception_handler(request, exc):
     logger.error("STL generation failed: %s", exc, exc_info=True)
     return Response(
-        content=json.dumps(
+        content=orjson.dumps(
             {"detail": f"STL generation failed: {exc}", "type": type(exc).__name__}
         ),
         status_code=500,
@@ -335,11 +306,137 @@ async def general_exception_handler(request, exc):
     )
 
 
+def _job_response(job_id: str, status: str, status_code: int) -> Response:
+    """Submit-endpoint body, built directly: job ids are uuid4 hex and the
+    status is one of our literals, so nothing needs escaping."""
+    content = f'{{"jobId":"{job_id}","status":"{status}"}}'.encode()
+    return Response(
+        content=content, status_code=status_code, media_type="application/json"
+    )
+
+
+def _plate_item_request(bin_data) -> tuple[str, BinRequest | BaseplateRequest] | None:
+    """Turn a plate item's binData into (cache_key, request), or None if empty."""
+    if isinstance(bin_data, PlateItemBinData):
+        bin_req = BinRequest(
+            width=bin_data.width,
+            depth=bin_data.depth,
+            height=bin_data.height,
+            type=bin_data.type,
+            wall_thickness=bin_data.wall_thickness,
+            dividers=bin_data.dividers,
+            magnets=bin_data.magnets,
+            stackable=bin_data.stackable,
+            finger_grabs=bin_data.finger_grabs,
+            label=bin_data.label,
+        )
+        return _cache_key("bin", bin_req), bin_req
+    if isinstance(bin_data, PlateItemBaseplateData):
+        bp_req = BaseplateRequest(
+            grid_width=bin_data.grid_width,
+            grid_depth=bin_data.grid_depth,
+            has_magnets=bin_data.has_magnets,
+        )
+        return _cache_key("baseplate", bp_req), bp_req
+    return None
+
+
+async def _resolve_stls(
+    items: list[tuple[str, BinRequest | BaseplateRequest]],
+) -> dict[str, bytes]:
+    """Return STL bytes per cache key, generating cache misses concurrently.
+
+    Each distinct cache key is generated at most once, however many items
+    share it. CAD rendering happens in threads (OCCT does its work outside
+    the GIL), at most ``worker_pool_size`` at a time, so the event loop
+    stays free.
+    """
+    stl_by_key: dict[str, bytes] = {}
+    misses: dict[str, BinRequest | BaseplateRequest] = {}
+    for cache_key, item_req in items:
+        if cache_key in stl_by_key or cache_key in misses:
+            continue
+        stl_bytes = stl_cache.get(cache_key)
+        if stl_bytes is None:
+            misses[cache_key] = item_req
+        else:
+            stl_by_key[cache_key] = stl_bytes
+
+    slots = asyncio.Semaphore(config.worker_pool_size)
+
+    async def generate(item_req: BinRequest | BaseplateRequest) -> bytes:
+        if isinstance(item_req, BinRequest):
+            fn = generate_bin_stl
+        else:
+            fn = generate_baseplate_stl
+        async with slots:
+            return await asyncio.to_thread(fn, item_req)
+
+    results = await asyncio.gather(*(generate(r) for r in misses.values()))
+    for cache_key, stl_bytes in zip(misses, results):
+        stl_cache.set(cache_key, stl_bytes)
+        stl_by_key[cache_key] = stl_bytes
+    return stl_by_key
+
+
+class _ZipStreamSink:
+    """Write-only file object that collects ZipBuilder output between yields."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _stream_zip(entries: list[tuple[str, bytes]]):
+    """Yield a ZIP archive of (filename, data) entries as it is written.
+
+    Entries are stored uncompressed: binary STL barely deflates, and
+    skipping compression lets the first bytes go out immediately. Each
+    entry's bytes are already in memory, so its local header carries the
+    real CRC and sizes and streaming unzippers can read it.
+    """
+    sink = _ZipStreamSink()
+    archive = ZipBuilder(0, out=sink)
+    for name, data in entries:
+        archive.add(name, data)
+        yield sink.drain()
+    archive.close()
+    yield sink.drain()
+
+
 def _cache_key(prefix: str, req) -> str:
-    data = json.dumps(req.model_dump(), sort_keys=True)
-    h = hashlib.sha256(data.encode()).hexdigest()[:16]
+    # Serialize the validated field values straight from __dict__ instead of
+    # building a model_dump() copy.
+    return _cache_key_from_dict(prefix, req.__dict__)
+
+
+def _cache_key_from_dict(prefix: str, fields: dict) -> str:
+    """Cache key for a request's complete field values (``dict(req)``).
+
+    Keys are not sorted: field dicts come out in declaration order, so
+    equal requests serialize identically. A raw request body is not a
+    valid input (aliases and omitted defaults would change the key).
+    """
+    data = orjson.dumps(fields, default=_model_fields)
+    # Not a security boundary, just an in-process cache key: BLAKE2b with an
+    # 8-byte digest is cheaper than SHA-256 and gives the same 16 hex chars.
+    h = hashlib.blake2b(data, digest_size=8).hexdigest()
     return f"{prefix}-{h}"
 
 
+def _model_fields(obj):
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
 def _client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 import time
-from collections import defaultdict
+from collections import deque
 from threading import Lock
 
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -19,8 +19,11 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         self._config = config
         self._job_store = job_store
         self._lock = Lock()
-        # Per-IP sliding window: ip -> list of timestamps
-        self._ip_hits: dict[str, list[float]] = defaultdict(list)
+        # Per-IP sliding window: ip -> timestamps, oldest first. Idle IPs
+        # are swept once per minute bucket, so the table only ever holds IPs
+        # seen in roughly the last two minutes.
+        self._ip_hits: dict[str, deque[float]] = {}
+        self._sweep_bucket = int(time.time() // 60)
         # Daily counter
         self._daily_count = 0
         self._daily_reset_at = time.time() + 86400
@@ -50,11 +53,17 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
             # Check 2: Per-IP per-minute
             window_start = now - 60
-            hits = self._ip_hits[client_ip]
-            hits[:] = [t for t in hits if t > window_start]
-            if len(hits) >= self._config.rate_limit_per_ip_per_minute:
-                oldest_in_window = min(hits) if hits else now
-                retry_after = max(1, int(oldest_in_window + 60 - now))
+            bucket = int(now // 60)
+            if bucket != self._sweep_bucket:
+                self._sweep_bucket = bucket
+                self._sweep_idle_ips(window_start)
+            hits = self._ip_hits.get(client_ip)
+            if hits is not None:
+                while hits and hits[0] <= window_start:
+                    hits.popleft()
+            if len(hits or ()) >= self._config.rate_limit_per_ip_per_minute:
+                oldest = hits[0] if hits else now
+                retry_after = max(1, int(oldest + 60 - now))
                 return self._too_many(
                     "Too many requests per minute", retry_after=retry_after
                 )
@@ -66,12 +75,25 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     "Too many concurrent jobs", retry_after=5
                 )
 
-            # All checks passed — record this request
+            # All checks passed — record this request. Rejected requests
+            # never add an entry for a new IP.
+            if hits is None:
+                hits = self._ip_hits[client_ip] = deque()
             hits.append(now)
             self._daily_count += 1
 
         return await call_next(request)
 
+    def _sweep_idle_ips(self, window_start: float) -> None:
+        """Forget IPs with no hits in the current window. Caller holds the lock."""
+        idle = [
+            ip
+            for ip, hits in self._ip_hits.items()
+            if not hits or hits[-1] <= window_start
+        ]
+        for ip in idle:
+            del self._ip_hits[ip]
+
     @staticmethod
     def _too_many(detail: str, retry_after: int) -> Response:
         return Response(
@@ -1,39 +1,71 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import math
-import zipfile
-from io import BytesIO
-from xml.etree.ElementTree import Element, SubElement, tostring
+from itertools import chain
+from typing import TYPE_CHECKING, BinaryIO
+from xml.sax.saxutils import escape
+
+from .zipwriter import ZipBuilder
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - cadquery normally pulls numpy in
+    np = None
+
+if TYPE_CHECKING:
+    from .generators import Triangles, Vertices
 
 
 def build_3mf(
     name: str,
-    meshes: list[tuple[str, list, list]],
+    meshes: list[tuple[str, Vertices, Triangles]],
     placements: list[tuple[str, float, float, float]],
     bed_width_mm: float | None = None,
     bed_depth_mm: float | None = None,
-) -> bytes:
+    compresslevel: int = 6,
+    dedup_geometry: bool = False,
+    out: BinaryIO | None = None,
+) -> bytes | None:
     """Build a 3MF ZIP from meshes and placements.
 
     Args:
         name: Model name (used in metadata).
         meshes: List of (cache_key, vertices, triangles). One entry per unique geometry.
+            Vertices and triangles are (N, 3) arrays or sequences of 3-tuples.
         placements: List of (cache_key, x_mm, y_mm, rotation_deg). One per item on plate.
         bed_width_mm: Optional bed width for metadata.
         bed_depth_mm: Optional bed depth for metadata.
+        compresslevel: Deflate level for the archive.
+        dedup_geometry: Also share one object between meshes whose vertices and
+            triangles are identical even though their cache keys differ (e.g.
+            bins that differ only in label).
+        out: Optional binary file to stream the archive into instead of
+            building it in memory.
 
     Returns:
-        3MF file as bytes (ZIP archive).
+        3MF file as bytes (ZIP archive), or None when written to ``out``.
     """
-    # Deduplicate meshes by cache_key
+    # Deduplicate meshes by cache_key (and optionally by content)
     key_to_object_id: dict[str, int] = {}
-    objects: list[tuple[int, list, list]] = []  # (object_id, vertices, triangles)
+    geometry_to_object_id: dict[object, int] = {}
+    objects: list[tuple[int, Vertices, Triangles]] = []  # (object_id, vertices, triangles)
 
     for cache_key, vertices, triangles in meshes:
-        if cache_key not in key_to_object_id:
-            obj_id = len(objects) + 1
-            key_to_object_id[cache_key] = obj_id
-            objects.append((obj_id, vertices, triangles))
+        if cache_key in key_to_object_id:
+            continue
+        if dedup_geometry:
+            geometry = _geometry_key(vertices, triangles)
+            obj_id = geometry_to_object_id.get(geometry)
+            if obj_id is not None:
+                key_to_object_id[cache_key] = obj_id
+                continue
+        obj_id = len(objects) + 1
+        key_to_object_id[cache_key] = obj_id
+        objects.append((obj_id, vertices, triangles))
+        if dedup_geometry:
+            geometry_to_object_id[geometry] = obj_id
 
     # Build 3D/3dmodel.model XML
     model_xml = _build_model_xml(
@@ -42,87 +74,193 @@ def build_3mf(
     )
 
     # Assemble ZIP
-    buf = BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
-        zf.writestr("_rels/.rels", _RELS)
-        zf.writestr("3D/3dmodel.model", model_xml)
+    archive = ZipBuilder(compresslevel, out)
+    archive.add("[Content_Types].xml", _CONTENT_TYPES.encode())
+    archive.add("_rels/.rels", _RELS.encode())
+    archive.add("3D/3dmodel.model", model_xml)
+    if out is not None:
+        archive.close()
+        return None
+    return archive.getvalue()
+
 
-    buf.seek(0)
-    return buf.getvalue()
+def _geometry_key(vertices: Vertices, triangles: Triangles) -> object:
+    """Hashable identity of a mesh's content."""
+    if hasattr(vertices, "tobytes") and hasattr(triangles, "tobytes"):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(vertices.tobytes())
+        h.update(triangles.tobytes())
+        return vertices.shape, vertices.dtype.str, triangles.shape, h.digest()
+    # Lists of tuples compare exactly; no hashing shortcut needed
+    return tuple(map(tuple, vertices)), tuple(map(tuple, triangles))
 
 
 def _build_model_xml(
     name: str,
-    objects: list[tuple[int, list, list]],
+    objects: list[tuple[int, Vertices, Triangles]],
     placements: list[tuple[str, float, float, float]],
     key_to_object_id: dict[str, int],
     bed_width_mm: float | None,
     bed_depth_mm: float | None,
-) -> str:
-    ns = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
-    model = Element("model", {"unit": "millimeter", "xmlns": ns})
+) -> bytes:
+    # The document is emitted directly, as UTF-8: apart from the metadata
+    # text every value is a number or a fixed literal, so only that text
+    # needs escaping (and encoding).
+    parts = [
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<model unit="millimeter" xmlns="%s">' % _MODEL_NS
+    ]
 
     # Metadata
-    _add_meta(model, "Title", name)
-    _add_meta(model, "Application", "Gridfinity Server")
+    _add_meta(parts, "Title", name)
+    _add_meta(parts, "Application", "Gridfinity Server")
     if bed_width_mm is not None:
-        _add_meta(model, "BedWidthMm", str(bed_width_mm))
+        _add_meta(parts, "BedWidthMm", str(bed_width_mm))
     if bed_depth_mm is not None:
-        _add_meta(model, "BedDepthMm", str(bed_depth_mm))
+        _add_meta(parts, "BedDepthMm", str(bed_depth_mm))
 
     # Resources
-    resources = SubElement(model, "resources")
+    parts.append(b"<resources>")
     for obj_id, vertices, triangles in objects:
-        obj_el = SubElement(resources, "object", {"id": str(obj_id), "type": "model"})
-        mesh_el = SubElement(obj_el, "mesh")
-
-        verts_el = SubElement(mesh_el, "vertices")
-        for x, y, z in vertices:
-            SubElement(verts_el, "vertex", {
-                "x": f"{x:.4f}", "y": f"{y:.4f}", "z": f"{z:.4f}",
-            })
-
-        tris_el = SubElement(mesh_el, "triangles")
-        for v1, v2, v3 in triangles:
-            SubElement(tris_el, "triangle", {
-                "v1": str(v1), "v2": str(v2), "v3": str(v3),
-            })
+        parts.append(b'<object id="%d" type="model">' % obj_id)
+        parts.append(_mesh_body(vertices, triangles))
+        parts.append(b"</object>")
+    parts.append(b"</resources>")
 
     # Build
-    build = SubElement(model, "build")
+    parts.append(b"<build>")
     for cache_key, x_mm, y_mm, rotation_deg in placements:
         obj_id = key_to_object_id[cache_key]
         transform = _transform_string(x_mm, y_mm, rotation_deg)
-        SubElement(build, "item", {
-            "objectid": str(obj_id),
-            "transform": transform,
-        })
+        parts.append(
+            b'<item objectid="%d" transform="%s" />' % (obj_id, transform.encode())
+        )
+    parts.append(b"</build></model>")
+
+    return b"".join(parts)
+
+
+_MODEL_NS = b"http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+_VERTEX_FMT = b'<vertex x="%.4f" y="%.4f" z="%.4f" />'
+_TRIANGLE_FMT = b'<triangle v1="%d" v2="%d" v3="%d" />'
+_FIXED_VERTEX_FMT = b'<vertex x="%s.%s" y="%s.%s" z="%s.%s" />'
+_TABLE_TRIANGLE_FMT = b'<triangle v1="%s" v2="%s" v3="%s" />'
+# Largest whole-mm magnitude the fixed-point path builds a digit table for
+_FIXED_MAX_MM = 100_000
+
+
+def _mesh_body(vertices: Vertices, triangles: Triangles) -> bytes:
+    """Serialize one <mesh> element."""
+    # One %-format call per block: repeating the template N times and
+    # feeding it the flattened coordinates keeps the whole loop in C.
+    # This measured faster than both per-row formatting and np.char.mod,
+    # and formatting straight to bytes beats formatting a str and encoding.
+    verts_xml = None
+    if hasattr(vertices, "ravel"):
+        verts_xml = _fixed_vertices(vertices)
+    if verts_xml is None:
+        verts_xml = (_VERTEX_FMT * len(vertices)) % _flatten(vertices)
+    if hasattr(triangles, "ravel"):
+        tris_xml = _indexed_triangles(triangles)
+    else:
+        tris_xml = (_TRIANGLE_FMT * len(triangles)) % _flatten(triangles)
+    return (
+        b"<mesh><vertices>" + verts_xml
+        + b"</vertices><triangles>" + tris_xml
+        + b"</triangles></mesh>"
+    )
+
+
+def _fixed_vertices(vertices: np.ndarray) -> bytes | None:
+    """<vertex> elements for an (N, 3) array, printed as fixed-point.
+
+    Coordinates are quantized to 0.0001 mm (parsed meshes already sit on
+    that grid, so the text matches %.4f) and split into whole and
+    fractional parts that index tables of preformatted digits: the final
+    %-format only copies bytes, which is about twice as fast as %.4f.
+    Returns None for values the tables don't cover.
+    """
+    coords = np.asarray(vertices, dtype=np.float64)
+    if not np.isfinite(coords).all():
+        return None
+    q = np.rint(coords * 10000).astype(np.int64)
+    whole, frac = np.divmod(np.abs(q), 10000)
+    span = int(whole.max(initial=0)) + 1
+    if span > _FIXED_MAX_MM:
+        return None
+    # Whole parts, then the same with a minus sign (so -0.5 gets "-0")
+    heads = np.array(
+        [b"%d" % i for i in range(span)] + [b"-%d" % i for i in range(span)],
+        dtype=object,
+    )
+    cells = np.empty(q.shape + (2,), dtype=object)
+    cells[..., 0] = heads[whole + (q < 0) * span]
+    cells[..., 1] = _frac_digits()[frac]
+    return (_FIXED_VERTEX_FMT * len(q)) % tuple(cells.ravel().tolist())
+
+
+def _indexed_triangles(triangles: np.ndarray) -> bytes:
+    """<triangle> elements for an (N, 3) index array.
+
+    Each vertex index is referenced about six times, so its digits are
+    formatted once into a table and the block is assembled from that.
+    Per-row bytearray appends measured about twice as slow.
+    """
+    count = int(triangles.max(initial=-1)) + 1
+    digits = np.array([b"%d" % i for i in range(count)], dtype=object)
+    refs = digits[triangles].ravel().tolist()
+    return (_TABLE_TRIANGLE_FMT * len(triangles)) % tuple(refs)
+
+
+@functools.cache
+def _frac_digits() -> np.ndarray:
+    """b"0000" .. b"9999" as an object array, indexed by value."""
+    return np.array([b"%04d" % i for i in range(10000)], dtype=object)
+
 
-    xml_decl = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    return xml_decl + tostring(model, encoding="unicode")
+def _flatten(rows: Vertices | Triangles) -> tuple:
+    """Row-major values of an (N, 3) array or a sequence of 3-tuples."""
+    if hasattr(rows, "ravel"):
+        # tolist() converts a whole NumPy array to Python scalars in C
+        return tuple(rows.ravel().tolist())
+    return tuple(chain.from_iterable(rows))
 
 
 def _transform_string(x_mm: float, y_mm: float, rotation_deg: float) -> str:
     """Build 3MF affine transform: rotate around Z then translate."""
+    # 3MF row-major 3x4: m00 m01 m02 m10 m11 m12 m20 m21 m22 m30 m31 m32
+    return f"{_rotation_fragment(rotation_deg)} {_fmt(x_mm)} {_fmt(y_mm)} 0"
+
+
+@functools.lru_cache(maxsize=64)
+def _rotation_fragment(rotation_deg: float) -> str:
+    """The nine rotation entries (m00..m22) of the transform.
+
+    Plates use a handful of angles (almost always multiples of 90), so
+    these are computed once per angle.
+    """
     theta = math.radians(rotation_deg)
     c = round(math.cos(theta), 6)
     s = round(math.sin(theta), 6)
-    # 3MF row-major 3x4: m00 m01 m02 m10 m11 m12 m20 m21 m22 m30 m31 m32
-    values = [c, -s, 0, s, c, 0, 0, 0, 1, x_mm, y_mm, 0]
-    return " ".join(_fmt(v) for v in values)
+    return " ".join(_fmt(v) for v in (c, -s, 0, s, c, 0, 0, 0, 1))
 
 
+@functools.lru_cache(maxsize=4096)
 def _fmt(v: float) -> str:
-    """Format a float, stripping trailing zeros."""
-    if v == int(v):
+    """Format a float, stripping trailing zeros.
+
+    Cached: placements are mostly grid-snapped, so the same handful of
+    coordinates repeat across items and plates.
+    """
+    if type(v) is int:
+        return str(v)
+    if v.is_integer():
         return str(int(v))
     return f"{v:.6f}".rstrip("0").rstrip(".")
 
 
-def _add_meta(parent: Element, name: str, value: str) -> None:
-    el = SubElement(parent, "metadata", {"name": name})
-    el.text = value
+def _add_meta(parts: list[bytes], name: str, value: str) -> None:
+    parts.append(f'<metadata name="{name}">{escape(value)}</metadata>'.encode())
 
 
 _CONTENT_TYPES = """\
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-import io
+import functools
 import logging
-import zipfile
-from concurrent.futures import Future, ProcessPoolExecutor
+import os
+import tempfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from .cache import stl_cache
+from .cache import mesh_cache, stl_cache
 from .config import ServerConfig
 from .job_store import JobStore
+from .zipwriter import ZipBuilder
+
+if TYPE_CHECKING:
+    from .generators import Triangles, Vertices
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +27,8 @@ def _generate_bin_in_worker(params: dict) -> tuple[bytes, str]:
     from .schemas import BinRequest
     from .generators import generate_bin_stl, bin_filename
 
-    req = BinRequest(**params)
+    # params are the fields of an already-validated request (see submit_bin)
+    req = BinRequest.model_construct(**params)
     stl_bytes = generate_bin_stl(req)
     fname = bin_filename(req)
     return stl_bytes, fname
@@ -31,14 +39,17 @@ def _generate_baseplate_in_worker(params: dict) -> tuple[bytes, str]:
     from .schemas import BaseplateRequest
     from .generators import generate_baseplate_stl, baseplate_filename
 
-    req = BaseplateRequest(**params)
+    req = BaseplateRequest.model_construct(**params)
     stl_bytes = generate_baseplate_stl(req)
     fname = baseplate_filename(req)
     return stl_bytes, fname
 
 
-def _generate_plate_in_worker(params: dict) -> tuple[bytes, str, str]:
-    """Generate a ZIP of STLs in a worker process. Returns (zip_bytes, filename, media_type)."""
+def _generate_plate_in_worker(params: dict, zip_level: int) -> tuple[bytes, str, str]:
+    """Generate a ZIP of STLs in a worker process. Returns (zip_bytes, filename, media_type).
+
+    ``zip_level`` is the pool's ServerConfig.plate_zip_level.
+    """
     from .schemas import BinRequest, BaseplateRequest
     from .generators import (
         generate_bin_stl,
@@ -50,85 +61,128 @@ def _generate_plate_in_worker(params: dict) -> tuple[bytes, str, str]:
     plate_name = params.get("name", "plate")
     items = params.get("items", [])
 
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for i, item in enumerate(items):
-            bin_data = item.get("bin_data") or item.get("binData")
-            if bin_data is None:
-                continue
-            item_type = item.get("item_type") or item.get("itemType")
+    # STL floats barely compress, so a fast level (or none) costs little size
+    archive = ZipBuilder(zip_level)
+    for i, item in enumerate(items):
+        bin_data = item.get("bin_data") or item.get("binData")
+        if bin_data is None:
+            continue
+        item_type = item.get("item_type") or item.get("itemType")
+
+        if item_type == "bin":
+            req = BinRequest(**bin_data)
+            stl_bytes = generate_bin_stl(req)
+            archive.add(bin_filename(req, index=i), stl_bytes)
+        elif item_type == "baseplate":
+            req = BaseplateRequest(**bin_data)
+            stl_bytes = generate_baseplate_stl(req)
+            archive.add(baseplate_filename(req), stl_bytes)
 
-            if item_type == "bin":
-                req = BinRequest(**bin_data)
-                stl_bytes = generate_bin_stl(req)
-                zf.writestr(bin_filename(req, index=i), stl_bytes)
-            elif item_type == "baseplate":
-                req = BaseplateRequest(**bin_data)
-                stl_bytes = generate_baseplate_stl(req)
-                zf.writestr(baseplate_filename(req), stl_bytes)
+    return archive.getvalue(), f"{plate_name}.zip", "application/zip"
 
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue(), f"{plate_name}.zip", "application/zip"
 
+def _generate_3mf_in_worker(
+    params: dict, result_dir: Path, dedup_geometry: bool
+) -> tuple[Path, str, str]:
+    """Generate a 3MF file in a worker process. Returns (3mf_path, filename, media_type).
 
-def _generate_3mf_in_worker(params: dict) -> tuple[bytes, str, str]:
-    """Generate a 3MF file in a worker process. Returns (3mf_bytes, filename, media_type)."""
-    from .schemas import BinRequest, BaseplateRequest
-    from .generators import generate_bin_stl, generate_baseplate_stl, parse_stl_to_mesh
+    The archive is streamed to a temp file in ``result_dir`` (the job
+    store's) rather than returned as bytes, so the result is never pickled
+    back or held in memory whole; the job store takes ownership of the
+    file, and removes it with the directory at shutdown if the job never
+    gets that far. ``dedup_geometry`` is the pool's
+    ServerConfig.threemf_dedup_geometry.
+
+    Also run on a thread in the server process when every item is already
+    cached there (see WorkerPool._should_inline).
+    """
+    from .generators import parse_stl_to_mesh
     from .threemf import build_3mf
-    from .main import _cache_key
 
     plate_name = params.get("name", "plate")
     items = params.get("items", [])
     bed_width = params.get("bed_width_mm")
     bed_depth = params.get("bed_depth_mm")
 
-    # Generate STLs and parse to meshes
-    stl_by_key: dict[str, bytes] = {}
-    meshes: list[tuple[str, list, list]] = []
+    # Generate STLs and parse to meshes. mesh_cache lives in this worker
+    # process, so repeat geometry across jobs skips CadQuery and the parse.
+    meshes: list[tuple[str, Vertices, Triangles]] = []
+    parsed_keys: set[str] = set()
     placements: list[tuple[str, float, float, float]] = []
 
     for item in items:
-        bin_data = item.get("bin_data") or item.get("binData")
-        item_type = item.get("item_type") or item.get("itemType")
+        resolved = _3mf_item(item)
+        if resolved is None:
+            continue
+        cache_key, req, generate = resolved
         x_mm = item.get("x_mm", item.get("xMm", 0))
         y_mm = item.get("y_mm", item.get("yMm", 0))
         rotation = item.get("rotation", 0)
 
-        if item_type == "bin":
-            req = BinRequest(**bin_data)
-            cache_key = _cache_key("bin", req)
-            if cache_key not in stl_by_key:
-                stl_by_key[cache_key] = generate_bin_stl(req)
-        elif item_type == "baseplate":
-            req = BaseplateRequest(**bin_data)
-            cache_key = _cache_key("baseplate", req)
-            if cache_key not in stl_by_key:
-                stl_by_key[cache_key] = generate_baseplate_stl(req)
-        else:
-            continue
-
-        # Parse mesh if not already done
-        if not any(m[0] == cache_key for m in meshes):
-            verts, tris = parse_stl_to_mesh(stl_by_key[cache_key])
+        if cache_key not in parsed_keys:
+            parsed_keys.add(cache_key)
+            mesh = mesh_cache.get(cache_key)
+            if mesh is None:
+                stl_bytes = stl_cache.get(cache_key) or generate(req)
+                mesh = parse_stl_to_mesh(stl_bytes)
+                mesh_cache.set(cache_key, mesh)
+            verts, tris = mesh
             meshes.append((cache_key, verts, tris))
 
         placements.append((cache_key, x_mm, y_mm, rotation))
 
-    threemf_bytes = build_3mf(plate_name, meshes, placements, bed_width, bed_depth)
-    return threemf_bytes, f"{plate_name}.3mf", "model/3mf"
+    fd, path = tempfile.mkstemp(prefix="gridfinity-", suffix=".3mf", dir=result_dir)
+    try:
+        with open(fd, "wb") as out:
+            build_3mf(
+                plate_name, meshes, placements, bed_width, bed_depth,
+                dedup_geometry=dedup_geometry,
+                out=out,
+            )
+    except BaseException:
+        os.unlink(path)
+        raise
+    return Path(path), f"{plate_name}.3mf", "model/3mf"
+
+
+def _3mf_item(item: dict):
+    """Resolve a 3MF plate item to (cache_key, request, generate), or None to skip it."""
+    from .schemas import BinRequest, BaseplateRequest
+    from .generators import generate_bin_stl, generate_baseplate_stl
+    from .main import _cache_key
+
+    bin_data = item.get("bin_data") or item.get("binData")
+    item_type = item.get("item_type") or item.get("itemType")
+    if item_type == "bin":
+        req = BinRequest(**bin_data)
+        return _cache_key("bin", req), req, generate_bin_stl
+    if item_type == "baseplate":
+        req = BaseplateRequest(**bin_data)
+        return _cache_key("baseplate", req), req, generate_baseplate_stl
+    return None
 
 
 class WorkerPool:
+    """Runs generation jobs off the event loop and records results in the job store.
+
+    CAD jobs go to a process pool. 3MF jobs whose items are all cached in
+    this process only need a mesh lookup and the XML build, so they run on
+    a thread here instead of paying to pickle the request and the result.
+    """
+
     def __init__(self, config: ServerConfig, job_store: JobStore):
         self._config = config
         self._job_store = job_store
         self._executor: ProcessPoolExecutor | None = None
+        self._threads: ThreadPoolExecutor | None = None
 
     def start(self) -> None:
         self._executor = ProcessPoolExecutor(
             max_workers=self._config.worker_pool_size
         )
+        self._threads = ThreadPoolExecutor(
+            max_workers=self._config.worker_pool_size, thread_name_prefix="inline-job"
+        )
         logger.info(
             "Worker pool started with %d workers", self._config.worker_pool_size
         )
@@ -136,41 +190,83 @@ class WorkerPool:
     def shutdown(self) -> None:
         if self._executor:
             self._executor.shutdown(wait=False, cancel_futures=True)
+            self._threads.shutdown(wait=False, cancel_futures=True)
             logger.info("Worker pool shut down")
 
     def submit_bin(self, job_id: str, params: dict, cache_key: str) -> None:
+        """Queue a bin job.
+
+        ``params`` must be the field dict of a validated BinRequest
+        (``dict(req)``, nested models included): the worker rebuilds it with
+        ``model_construct`` and does not validate again.
+        """
         self._submit(job_id, _generate_bin_in_worker, params, cache_key)
 
     def submit_baseplate(self, job_id: str, params: dict, cache_key: str) -> None:
+        """Queue a baseplate job. Same ``params`` contract as submit_bin."""
         self._submit(job_id, _generate_baseplate_in_worker, params, cache_key)
 
     def submit_plate(self, job_id: str, params: dict) -> None:
-        self._submit(job_id, _generate_plate_in_worker, params, cache_key=None)
+        fn = functools.partial(
+            _generate_plate_in_worker, zip_level=self._config.plate_zip_level
+        )
+        self._submit(job_id, fn, params, cache_key=None)
 
     def submit_plate_3mf(self, job_id: str, params: dict) -> None:
-        self._submit(job_id, _generate_3mf_in_worker, params, cache_key=None)
-
-    def _submit(self, job_id: str, fn, params: dict, cache_key: str | None) -> None:
-        self._job_store.set_running(job_id)
-        future: Future = self._executor.submit(fn, params)
-        future.add_done_callback(
-            lambda f: self._on_done(f, job_id, cache_key)
+        executor = self._threads if self._should_inline(params) else self._executor
+        fn = functools.partial(
+            _generate_3mf_in_worker,
+            result_dir=self._job_store.result_dir,
+            dedup_geometry=self._config.threemf_dedup_geometry,
         )
+        self._submit(job_id, fn, params, cache_key=None, executor=executor)
+
+    @staticmethod
+    def _should_inline(params: dict) -> bool:
+        """True if no item of a 3MF job needs CAD work in this process."""
+        for item in params.get("items", []):
+            try:
+                resolved = _3mf_item(item)
+            except (TypeError, ValueError):
+                return False  # let the worker run it and record the failure
+            if resolved is None:
+                continue
+            cache_key = resolved[0]
+            if mesh_cache.get(cache_key) is None and stl_cache.get(cache_key) is None:
+                return False
+        return True
+
+    def _submit(
+        self,
+        job_id: str,
+        fn,
+        params: dict,
+        cache_key: str | None,
+        executor: Executor | None = None,
+    ) -> None:
+        self._job_store.set_running(job_id)
+        future: Future = (executor or self._executor).submit(fn, params)
+        future.add_done_callback(functools.partial(self._on_done, job_id, cache_key))
 
-    def _on_done(self, future: Future, job_id: str, cache_key: str | None) -> None:
+    def _on_done(self, job_id: str, cache_key: str | None, future: Future) -> None:
         try:
             result = future.result()
             if len(result) == 2:
-                stl_bytes, filename = result
+                data, filename = result
                 media_type = "application/octet-stream"
             else:
-                stl_bytes, filename, media_type = result
+                data, filename, media_type = result
 
-            self._job_store.set_complete(job_id, stl_bytes, filename, media_type)
+            if isinstance(data, Path):
+                self._job_store.set_complete(
+                    job_id, None, filename, media_type, result_path=data
+                )
+            else:
+                self._job_store.set_complete(job_id, data, filename, media_type)
 
             # Populate stl_cache so sync endpoints benefit
             if cache_key is not None:
-                stl_cache.set(cache_key, stl_bytes)
+                stl_cache.set(cache_key, data)
 
             logger.info("Job %s completed: %s", job_id, filename)
         except Exception as exc:
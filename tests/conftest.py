@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Executor, Future
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gridfinity_server import generators, worker
+from gridfinity_server.cache import LRUCache
+from gridfinity_server.main import app, config, get_worker_pool, job_store
+from gridfinity_server.worker import WorkerPool
+
+
+class _QueueExecutor(Executor):
+    """Holds submitted calls until ``run_all``, then runs them in order on
+    the calling thread."""
+
+    def __init__(self) -> None:
+        self._queue: list[tuple[Future, object, tuple, dict]] = []
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        self._queue.append((future, fn, args, kwargs))
+        return future
+
+    def run_all(self) -> None:
+        while self._queue:
+            future, fn, args, kwargs = self._queue.pop(0)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        for future, *_ in self._queue:
+            future.cancel()
+        self._queue.clear()
+
+
+def _fake_stl(req) -> bytes:
+    return b"fake-stl"
+
+
+def _fake_mesh(stl_bytes: bytes):
+    return [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], [(0, 1, 2)]
+
+
+class FakeWorkerPool(WorkerPool):
+    """WorkerPool that queues jobs in-process and runs them on ``run_jobs()``.
+
+    Submitted jobs stay pending, as with the real pool, until a test runs
+    them. They then go through the real job functions and done callback,
+    but with CAD generation and STL parsing stubbed out and against
+    throwaway caches, so nothing leaks into the app's stl_cache/mesh_cache
+    and no worker processes are started.
+    """
+
+    def start(self) -> None:
+        self._executor = self._threads = _QueueExecutor()
+
+    def run_jobs(self) -> None:
+        with ExitStack() as stack:
+            for name, fake in (
+                ("generate_bin_stl", _fake_stl),
+                ("generate_baseplate_stl", _fake_stl),
+                ("parse_stl_to_mesh", _fake_mesh),
+            ):
+                stack.enter_context(patch.object(generators, name, fake))
+            stack.enter_context(patch.object(worker, "stl_cache", LRUCache()))
+            stack.enter_context(patch.object(worker, "mesh_cache", LRUCache()))
+            self._executor.run_all()
+
+
+@pytest.fixture(scope="session")
+def test_ip() -> str:
+    """Client IP for job records that tests create: gw0 -> 127.0.1.1, ...,
+    or 127.0.1.0 without pytest-xdist.
+
+    This does not isolate workers from each other: each xdist worker is a
+    separate process with its own job_store, so their IPs could not
+    collide anyway. It only labels this process's records, with an
+    address that none of the literal IPs in the tests use.
+    """
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "")
+    n = int(worker_id[2:]) + 1 if worker_id.startswith("gw") else 0
+    return f"127.0.{1 + n // 250}.{n % 250}"
+
+
+@pytest.fixture(scope="session")
+def worker_pool():
+    pool = FakeWorkerPool(config, job_store)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope="session")
+def client(worker_pool):
+    """TestClient with the app lifespan entered once per session and job
+    endpoints wired to the fake worker pool. The lifespan closes the job
+    store on exit; closing again also covers a failed startup."""
+    app.dependency_overrides[get_worker_pool] = lambda: worker_pool
+    try:
+        with TestClient(app) as c:
+            yield c
+    finally:
+        app.dependency_overrides.pop(get_worker_pool, None)
+        job_store.close()
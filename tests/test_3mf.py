@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import struct
 import zipfile
 from io import BytesIO
 from xml.etree import ElementTree as ET
 
+import numpy as np
 import pytest
-from fastapi.testclient import TestClient
 
+from gridfinity_server import generators
 from gridfinity_server.generators import parse_stl_to_mesh
 from gridfinity_server.threemf import build_3mf
 
@@ -33,6 +35,25 @@ endsolid tiny
 """
 
 
+def _binary_stl(facets, header: bytes = b"binary") -> bytes:
+    body = b"".join(
+        struct.pack("<12fH", 0, 0, 1, *(c for v in facet for c in v), 0)
+        for facet in facets
+    )
+    return header.ljust(80, b" ") + struct.pack("<I", len(facets)) + body
+
+
+TINY_BINARY_STL = _binary_stl([
+    [(0, 0, 0), (1, 0, 0), (0, 1, 0)],
+    [(1, 0, 0), (1, 1, 0), (0, 1, 0)],
+])
+
+
+def _faces(verts, tris) -> list[tuple]:
+    """Each triangle as a tuple of corner coordinates (arrays or lists)."""
+    return [tuple(tuple(float(c) for c in verts[int(i)]) for i in tri) for tri in tris]
+
+
 class TestParseStlToMesh:
     def test_vertex_count(self):
         verts, tris = parse_stl_to_mesh(TINY_STL)
@@ -55,6 +76,75 @@ class TestParseStlToMesh:
         assert len(verts) == 0
         assert len(tris) == 0
 
+    def test_dict_fallback_without_numpy(self, monkeypatch):
+        expected_verts, expected_tris = parse_stl_to_mesh(TINY_STL)
+        monkeypatch.setattr(generators, "np", None)
+        verts, tris = parse_stl_to_mesh(TINY_STL)
+        assert len(verts) == len(expected_verts)
+        faces = set(_faces(verts, tris))
+        expected = set(_faces(expected_verts, expected_tris))
+        assert faces == expected
+
+
+class TestParseBinaryStl:
+    def test_vertex_and_triangle_count(self):
+        verts, tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        assert len(verts) == 4
+        assert len(tris) == 2
+
+    def test_triangles_reference_original_positions(self):
+        verts, tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        assert _faces(verts, tris) == [
+            ((0, 0, 0), (1, 0, 0), (0, 1, 0)),
+            ((1, 0, 0), (1, 1, 0), (0, 1, 0)),
+        ]
+
+    def test_header_starting_with_solid(self):
+        stl = _binary_stl([[(0, 0, 0), (1, 0, 0), (0, 1, 0)]], header=b"solid part")
+        verts, tris = parse_stl_to_mesh(stl)
+        assert len(verts) == 3
+        assert len(tris) == 1
+
+    def test_matches_ascii_parse(self):
+        ascii_verts, ascii_tris = parse_stl_to_mesh(TINY_STL)
+        bin_verts, bin_tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        ascii_faces = set(_faces(ascii_verts, ascii_tris))
+        bin_faces = set(_faces(bin_verts, bin_tris))
+        assert ascii_faces == bin_faces
+
+    def test_returns_numpy_arrays(self):
+        verts, tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        assert verts.shape == (4, 3) and verts.dtype == np.float32
+        assert tris.shape == (2, 3) and tris.dtype == np.int32
+
+    def test_empty_binary_stl(self):
+        verts, tris = parse_stl_to_mesh(_binary_stl([]))
+        assert len(verts) == 0
+        assert len(tris) == 0
+
+    def test_struct_fallback_without_numpy(self, monkeypatch):
+        expected_verts, expected_tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        monkeypatch.setattr(generators, "np", None)
+        verts, tris = parse_stl_to_mesh(TINY_BINARY_STL)
+        assert len(verts) == len(expected_verts)
+        faces = set(_faces(verts, tris))
+        expected = set(_faces(expected_verts, expected_tris))
+        assert faces == expected
+
+    def test_struct_fallback_signed_and_large_coords(self, monkeypatch):
+        monkeypatch.setattr(generators, "np", None)
+        a, b, c = (-210.5, 0, -0.25), (210.5, 0, 0.25), (0, -210.5, 42)
+        verts, tris = parse_stl_to_mesh(_binary_stl([[a, b, c], [c, b, a]]))
+        assert verts == [a, b, c]
+        assert tris == [(0, 1, 2), (2, 1, 0)]
+
+    def test_signed_coords_and_negative_zero(self):
+        a, b, c = (-210.5, 0, -0.25), (210.5, 0, 0.25), (0, -210.5, 42)
+        stl = _binary_stl([[a, b, c], [c, b, (-0.0, 0, -0.0)], [(0, 0, 0), a, b]])
+        verts, tris = parse_stl_to_mesh(stl)
+        assert len(verts) == 4
+        assert _faces(verts, tris) == [(a, b, c), (c, b, (0, 0, 0)), ((0, 0, 0), a, b)]
+
 
 class TestBuild3mfStructure:
     def _make_3mf(self, **kwargs):
@@ -106,6 +196,71 @@ class TestBuild3mfStructure:
         assert metas["BedWidthMm"] == "220.0"
         assert metas["BedDepthMm"] == "220.0"
 
+    def test_mesh_vertices_and_triangles(self):
+        data = self._make_3mf(
+            meshes=[("key1", [(0, 0, 0), (1.5, 0, 0), (0, 2.25, 3)], [(0, 1, 2)])],
+        )
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            model_xml = zf.read("3D/3dmodel.model")
+        root = ET.fromstring(model_xml)
+        ns = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+        mesh = root.find("m:resources/m:object/m:mesh", ns)
+        verts = [
+            (v.get("x"), v.get("y"), v.get("z"))
+            for v in mesh.findall("m:vertices/m:vertex", ns)
+        ]
+        tris = [
+            (t.get("v1"), t.get("v2"), t.get("v3"))
+            for t in mesh.findall("m:triangles/m:triangle", ns)
+        ]
+        assert verts == [
+            ("0.0000", "0.0000", "0.0000"),
+            ("1.5000", "0.0000", "0.0000"),
+            ("0.0000", "2.2500", "3.0000"),
+        ]
+        assert tris == [("0", "1", "2")]
+
+    def test_array_and_list_meshes_match(self):
+        verts = [(0, 0, 0), (1.5, 0, 0), (0, 2.25, 3)]
+        tris = [(0, 1, 2)]
+        from_lists = self._make_3mf(meshes=[("key1", verts, tris)])
+        from_arrays = self._make_3mf(meshes=[
+            ("key1", np.array(verts, dtype=np.float32), np.array(tris, dtype=np.int32)),
+        ])
+        with zipfile.ZipFile(BytesIO(from_lists)) as a, zipfile.ZipFile(BytesIO(from_arrays)) as b:
+            assert a.read("3D/3dmodel.model") == b.read("3D/3dmodel.model")
+
+    @pytest.mark.parametrize("vertex", [(-0.5, 0.0001, -12.0001), (-0.0001, 250.9999, -0.25)])
+    def test_signed_fractional_array_vertices_match_lists(self, vertex):
+        verts = [(0, 0, 0), vertex, (1, 1, 1)]
+        tris = [(0, 1, 2)]
+        from_lists = self._make_3mf(meshes=[("key1", verts, tris)])
+        from_arrays = self._make_3mf(meshes=[
+            ("key1", np.array(verts, dtype=np.float32), np.array(tris, dtype=np.int32)),
+        ])
+        with zipfile.ZipFile(BytesIO(from_lists)) as a, zipfile.ZipFile(BytesIO(from_arrays)) as b:
+            assert a.read("3D/3dmodel.model") == b.read("3D/3dmodel.model")
+
+    def test_mesh_markup_in_name_stays_text(self):
+        data = self._make_3mf(name="<mesh>1</mesh>")
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            model_xml = zf.read("3D/3dmodel.model")
+        root = ET.fromstring(model_xml)
+        ns = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+        metas = {m.get("name"): m.text for m in root.findall("m:metadata", ns)}
+        assert metas["Title"] == "<mesh>1</mesh>"
+        assert len(root.findall("m:resources/m:object/m:mesh/m:vertices/m:vertex", ns)) == 3
+
+    def test_non_ascii_name_is_utf8(self):
+        data = self._make_3mf(name="Schublade für Bits")
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            model_xml = zf.read("3D/3dmodel.model")
+        assert "Schublade für Bits".encode("utf-8") in model_xml
+        root = ET.fromstring(model_xml)
+        ns = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+        metas = {m.get("name"): m.text for m in root.findall("m:metadata", ns)}
+        assert metas["Title"] == "Schublade für Bits"
+
 
 class TestBuild3mfDeduplication:
     def test_same_key_shares_object(self):
@@ -140,6 +295,41 @@ class TestBuild3mfDeduplication:
         objects = root.findall("m:resources/m:object", ns)
         assert len(objects) == 2
 
+    def test_identical_geometry_shares_object(self):
+        verts = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0)], dtype=np.float32)
+        tris = np.array([(0, 1, 2)], dtype=np.int32)
+        other = np.array([(0, 0, 0), (2, 0, 0), (0, 2, 0)], dtype=np.float32)
+        data = build_3mf(
+            name="content",
+            meshes=[("keyA", verts, tris), ("keyB", verts.copy(), tris.copy()),
+                    ("keyC", other, tris)],
+            placements=[("keyA", 0, 0, 0), ("keyB", 42, 0, 0), ("keyC", 84, 0, 0)],
+            dedup_geometry=True,
+        )
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            model_xml = zf.read("3D/3dmodel.model")
+        root = ET.fromstring(model_xml)
+        ns = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+        objects = root.findall("m:resources/m:object", ns)
+        items = root.findall("m:build/m:item", ns)
+        assert len(objects) == 2
+        assert [i.get("objectid") for i in items] == ["1", "1", "2"]
+
+    def test_identical_geometry_lists_share_object(self):
+        verts = [(0, 0, 0), (1, 0, 0), (0, 1, 0)]
+        tris = [(0, 1, 2)]
+        data = build_3mf(
+            name="content",
+            meshes=[("keyA", verts, tris), ("keyB", list(verts), list(tris))],
+            placements=[("keyA", 0, 0, 0), ("keyB", 42, 0, 0)],
+            dedup_geometry=True,
+        )
+        with zipfile.ZipFile(BytesIO(data)) as zf:
+            model_xml = zf.read("3D/3dmodel.model")
+        root = ET.fromstring(model_xml)
+        ns = {"m": "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"}
+        assert len(root.findall("m:resources/m:object", ns)) == 1
+
 
 class TestBuild3mfTransform:
     def _get_transform(self, rotation_deg: float, x: float = 0, y: float = 0) -> str:
@@ -179,12 +369,6 @@ class TestBuild3mfTransform:
 
 @pytest.mark.slow
 class TestSync3mfEndpoint:
-    @pytest.fixture(scope="class")
-    def client(self):
-        from gridfinity_server.main import app
-        with TestClient(app) as c:
-            yield c
-
     def test_basic_3mf(self, client):
         resp = client.post("/api/plate/3mf", json={
             "name": "test-plate",
@@ -213,13 +397,8 @@ class TestSync3mfEndpoint:
 
 
 class TestAsync3mfEndpoint:
-    @pytest.fixture(scope="class")
-    def client(self):
-        from gridfinity_server.main import app
-        with TestClient(app) as c:
-            yield c
-
-    def test_submit_returns_202(self, client):
+    def test_submit_returns_202(self, client, worker_pool):
+        from gridfinity_server.main import job_store
         resp = client.post("/api/jobs/plate-3mf", json={
             "name": "async-plate",
             "items": [
@@ -236,10 +415,19 @@ class TestAsync3mfEndpoint:
         assert "jobId" in data
         assert data["status"] == "pending"
 
-    def test_manual_complete_and_status(self, client):
+        worker_pool.run_jobs()
+        resp = client.get(f"/api/jobs/{data['jobId']}")
+        assert resp.json()["status"] == "complete"
+        result = client.get(f"/api/jobs/{data['jobId']}/result")
+        assert result.headers["content-type"] == "model/3mf"
+        assert zipfile.is_zipfile(BytesIO(result.content))
+        assert job_store.get(data["jobId"]).result_path.parent == job_store.result_dir
+
+    def test_manual_complete_and_status(self, client, test_ip):
         from gridfinity_server.main import job_store
-        job = job_store.create("plate-3mf", client_ip="test")
-        job_store.set_complete(job.job_id, b"fake-3mf", "test.3mf", "model/3mf")
+        job = job_store.create_complete(
+            "plate-3mf", test_ip, b"fake-3mf", "test.3mf", "model/3mf"
+        )
 
         resp = client.get(f"/api/jobs/{job.job_id}")
         assert resp.status_code == 200
@@ -249,12 +437,6 @@ class TestAsync3mfEndpoint:
 
 
 class TestValidation3mf:
-    @pytest.fixture(scope="class")
-    def client(self):
-        from gridfinity_server.main import app
-        with TestClient(app) as c:
-            yield c
-
     def test_empty_items_returns_422(self, client):
         resp = client.post("/api/plate/3mf", json={
             "name": "empty",
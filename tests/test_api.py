@@ -1,7 +1,16 @@
+import dataclasses
+import io
+import struct
+import threading
+import zipfile
+
 import pytest
 from fastapi.testclient import TestClient
 
-from gridfinity_server.main import app
+from gridfinity_server import main
+from gridfinity_server.cache import mesh_cache, stl_cache
+from gridfinity_server.main import _cache_key, _cache_key_from_dict, _stream_zip, app
+from gridfinity_server.schemas import BinRequest, Dividers
 
 client = TestClient(app)
 
@@ -10,9 +19,161 @@ class TestHealthEndpoint:
     def test_health(self):
         r = client.get("/api/health")
         assert r.status_code == 200
+        assert r.headers["content-type"] == "application/json"
         data = r.json()
         assert data["status"] == "ok"
-        assert "version" in data
+        assert data["version"] == app.version
+
+
+class TestCacheKey:
+    def test_equal_requests_share_key(self):
+        a = BinRequest(width=2, depth=1, height=3, wallThickness=1.5)
+        b = BinRequest(width=2, depth=1, height=3, wall_thickness=1.5)
+        assert _cache_key("bin", a) == _cache_key("bin", b)
+
+    def test_nested_fields_affect_key(self):
+        plain = BinRequest(width=2, depth=1, height=3)
+        divided = BinRequest(
+            width=2, depth=1, height=3, dividers=Dividers(horizontal=1)
+        )
+        assert _cache_key("bin", plain) != _cache_key("bin", divided)
+
+    def test_field_dict_matches_model(self):
+        req = BinRequest(width=2, depth=1, height=3, label="Screws")
+        assert _cache_key_from_dict("bin", dict(req)) == _cache_key("bin", req)
+
+    def test_prefix_and_length(self):
+        key = _cache_key("bin", BinRequest(width=1, depth=1, height=1))
+        prefix, digest = key.split("-")
+        assert prefix == "bin"
+        assert len(digest) == 16
+
+
+class TestStreamZip:
+    def test_streamed_zip_is_readable(self):
+        entries = [("a.stl", b"first"), ("b.stl", b"second" * 1000)]
+        data = b"".join(_stream_zip(entries))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.namelist() == ["a.stl", "b.stl"]
+            assert zf.read("a.stl") == b"first"
+            assert zf.read("b.stl") == b"second" * 1000
+            assert zf.testzip() is None
+
+    def test_local_headers_carry_sizes(self):
+        data = b"".join(_stream_zip([("a.stl", b"first"), ("b.stl", b"second")]))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                assert not info.flag_bits & 0x08  # no data descriptor
+                header = data[info.header_offset:info.header_offset + 30]
+                crc, compressed, size = struct.unpack("<3L", header[14:26])
+                assert (crc, compressed, size) == (info.CRC, info.file_size, info.file_size)
+
+    def test_yields_chunk_per_entry(self):
+        chunks = list(_stream_zip([("a.stl", b"1"), ("b.stl", b"2")]))
+        assert len(chunks) == 3  # one per entry + central directory
+        assert all(chunks)
+
+    def test_empty_zip(self):
+        data = b"".join(_stream_zip([]))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.namelist() == []
+
+
+class TestPlateGeneration:
+    def test_cache_misses_generate_concurrently(self, monkeypatch):
+        # Both generations must be in flight at once to pass the barrier.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_generate(req):
+            barrier.wait()
+            return f"stl-{req.width}".encode()
+
+        monkeypatch.setattr(main, "generate_bin_stl", fake_generate)
+        monkeypatch.setattr(
+            main, "config", dataclasses.replace(main.config, worker_pool_size=2)
+        )
+        stl_cache.clear()
+        r = client.post("/api/plate/stl", json={
+            "name": "parallel",
+            "items": [
+                {"itemType": "bin", "binData": {"width": 1, "depth": 1, "height": 2}},
+                {"itemType": "bin", "binData": {"width": 2, "depth": 1, "height": 2}},
+            ],
+        })
+        stl_cache.clear()
+
+        assert r.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            assert zf.read("bin-1x1x2-hollow-0.stl") == b"stl-1"
+            assert zf.read("bin-2x1x2-hollow-1.stl") == b"stl-2"
+
+    def test_identical_items_generate_once(self, monkeypatch):
+        calls = []
+
+        def fake_generate(req):
+            calls.append(req)
+            return b"stl"
+
+        monkeypatch.setattr(main, "generate_bin_stl", fake_generate)
+        stl_cache.clear()
+        item = {"itemType": "bin", "binData": {"width": 1, "depth": 1, "height": 6}}
+        r = client.post("/api/plate/stl", json={"name": "copies", "items": [item] * 12})
+        stl_cache.clear()
+
+        assert r.status_code == 200
+        assert len(calls) == 1
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            assert len(zf.namelist()) == 12
+
+    def test_3mf_reuses_parsed_mesh(self, monkeypatch):
+        parses = []
+
+        def fake_parse(stl_bytes):
+            parses.append(stl_bytes)
+            return [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], [(0, 1, 2)]
+
+        monkeypatch.setattr(main, "generate_bin_stl", lambda req: b"stl")
+        monkeypatch.setattr(main, "parse_stl_to_mesh", fake_parse)
+        stl_cache.clear()
+        mesh_cache.clear()
+        plate = {
+            "name": "repeat",
+            "items": [{"itemType": "bin", "binData": {"width": 1, "depth": 1, "height": 3}}],
+        }
+        first = client.post("/api/plate/3mf", json=plate)
+        second = client.post("/api/plate/3mf", json=plate)
+        stl_cache.clear()
+        mesh_cache.clear()
+
+        assert first.status_code == second.status_code == 200
+        assert len(parses) == 1
+
+    def test_3mf_mesh_hit_skips_evicted_stl(self, monkeypatch):
+        renders = []
+
+        def fake_generate(req):
+            renders.append(req)
+            return b"stl"
+
+        monkeypatch.setattr(main, "generate_bin_stl", fake_generate)
+        monkeypatch.setattr(
+            main,
+            "parse_stl_to_mesh",
+            lambda stl: ([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], [(0, 1, 2)]),
+        )
+        stl_cache.clear()
+        mesh_cache.clear()
+        plate = {
+            "name": "evicted",
+            "items": [{"itemType": "bin", "binData": {"width": 1, "depth": 1, "height": 3}}],
+        }
+        first = client.post("/api/plate/3mf", json=plate)
+        stl_cache.clear()  # the STL is gone, the parsed mesh is not
+        second = client.post("/api/plate/3mf", json=plate)
+        mesh_cache.clear()
+
+        assert first.status_code == second.status_code == 200
+        assert len(renders) == 1
 
 
 @pytest.mark.slow
@@ -76,3 +237,8 @@ class TestPlateEndpoint:
         assert r.status_code == 200
         assert r.headers["content-type"] == "application/zip"
         assert len(r.content) > 100
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            assert zf.namelist() == [
+                "bin-1x1x2-hollow-0.stl",
+                "bin-2x1x2-hollow-1.stl",
+            ]
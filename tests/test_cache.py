@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from unittest.mock import patch
+
+from gridfinity_server.cache import LRUCache
+
+
+def test_get_missing_returns_none():
+    cache = LRUCache()
+    assert cache.get("missing") is None
+
+
+def test_set_and_get():
+    cache = LRUCache()
+    cache.set("a", b"data")
+    assert cache.get("a") == b"data"
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", b"3")
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+
+
+def test_overwrite_refreshes_recency():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.set("a", b"1b")
+    cache.set("c", b"3")
+
+    assert cache.get("a") == b"1b"
+    assert cache.get("b") is None
+
+
+def test_expired_entry_returns_none():
+    cache = LRUCache(ttl_seconds=1)
+    cache.set("a", b"data")
+
+    with patch("gridfinity_server.cache.time") as mock_time:
+        mock_time.time.return_value = time.time() + 2
+        assert cache.get("a") is None
+
+    assert cache.get("a") is None
+
+
+def test_hit_does_not_wait_for_writer_lock():
+    cache = LRUCache()
+    cache.set("a", b"data")
+    with cache._lock:
+        assert cache.get("a") == b"data"
+
+
+def test_hits_and_rewrites_never_remove_live_keys():
+    # Lock-free readers must not see a gap while a key's recency changes
+    class RecordingDict(OrderedDict):
+        removed: list[str] = []
+
+        def __delitem__(self, key):
+            self.removed.append(key)
+            super().__delitem__(key)
+
+        def pop(self, key, *default):
+            self.removed.append(key)
+            return super().pop(key, *default)
+
+    cache = LRUCache(max_entries=2)
+    cache._cache = RecordingDict()
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("b", b"2b")
+
+    assert cache._cache.removed == []
+    assert list(cache._cache) == ["a", "b"]
+
+
+def test_clear():
+    cache = LRUCache()
+    cache.set("a", b"data")
+    cache.clear()
+    assert cache.get("a") is None
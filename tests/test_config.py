@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from gridfinity_server.config import load_config
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    load_config.cache_clear()
+    yield
+    load_config.cache_clear()
+
+
+def test_reads_environment(monkeypatch):
+    monkeypatch.setenv("GRID_WORKER_POOL_SIZE", "7")
+    monkeypatch.setenv("GRID_RATE_LIMIT_ENABLED", "yes")
+    config = load_config()
+    assert config.worker_pool_size == 7
+    assert config.rate_limit_enabled is True
+
+
+def test_result_is_cached(monkeypatch):
+    monkeypatch.setenv("GRID_WORKER_POOL_SIZE", "3")
+    first = load_config()
+    monkeypatch.setenv("GRID_WORKER_POOL_SIZE", "5")
+    assert load_config() is first
+
+    load_config.cache_clear()
+    assert load_config().worker_pool_size == 5
+
+
+def test_plate_zip_level(monkeypatch):
+    monkeypatch.delenv("GRID_PLATE_ZIP_LEVEL", raising=False)
+    assert load_config().plate_zip_level == 1
+
+    load_config.cache_clear()
+    monkeypatch.setenv("GRID_PLATE_ZIP_LEVEL", "0")
+    assert load_config().plate_zip_level == 0
+
+
+@pytest.mark.parametrize("level", ["-1", "10"])
+def test_rejects_out_of_range_zip_level(monkeypatch, level):
+    monkeypatch.setenv("GRID_PLATE_ZIP_LEVEL", level)
+    with pytest.raises(ValueError, match="GRID_PLATE_ZIP_LEVEL"):
+        load_config()
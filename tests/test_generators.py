@@ -24,6 +24,14 @@ class TestFilenames:
         req = BinRequest(width=2, depth=2, height=3, label="Screws")
         assert bin_filename(req) == "bin-2x2x3-hollow-Screws.stl"
 
+    def test_bin_filename_strips_unsafe_label_chars(self):
+        req = BinRequest(width=1, depth=1, height=2, label="M3/M4 screws!")
+        assert bin_filename(req) == "bin-1x1x2-hollow-M3M4 screws.stl"
+
+    def test_bin_filename_keeps_non_ascii_letters(self):
+        req = BinRequest(width=1, depth=1, height=2, label="Schrauben größe ★")
+        assert bin_filename(req) == "bin-1x1x2-hollow-Schrauben größe.stl"
+
     def test_bin_filename_with_index(self):
         req = BinRequest(width=1, depth=1, height=2)
         assert bin_filename(req, index=3) == "bin-1x1x2-hollow-3.stl"
@@ -42,6 +50,13 @@ class TestBinGeneration:
         stl = generate_bin_stl(req)
         assert len(stl) > 84  # binary STL minimum: 80-byte header + 4-byte count
 
+    def test_output_is_binary_stl(self):
+        req = BinRequest(width=1, depth=1, height=2)
+        stl = generate_bin_stl(req)
+        count = int.from_bytes(stl[80:84], "little")
+        assert count > 0
+        assert len(stl) == 84 + count * 50
+
     def test_bin_with_dividers(self):
         from gridfinity_server.schemas import Dividers
         req = BinRequest(
@@ -23,8 +23,8 @@ def test_get_missing_returns_none():
     assert store.get("nonexistent") is None
 
 
-def test_lifecycle_pending_to_complete():
-    store = JobStore()
+def test_lifecycle_pending_to_complete(tmp_path):
+    store = JobStore(result_dir=tmp_path)
     job = store.create("bin")
     assert job.status == JobStatus.PENDING
 
@@ -59,8 +59,8 @@ def test_expired_job_returns_none():
         assert store.get(job.job_id) is None
 
 
-def test_active_count():
-    store = JobStore()
+def test_active_count(tmp_path):
+    store = JobStore(result_dir=tmp_path)
     store.create("bin", client_ip="10.0.0.1")
     store.create("bin", client_ip="10.0.0.2")
     j3 = store.create("bin", client_ip="10.0.0.1")
@@ -73,6 +73,34 @@ def test_active_count():
     assert store.active_count(client_ip="10.0.0.1") == 1
 
 
+def test_active_count_after_failure_and_expiry():
+    store = JobStore(max_age_seconds=1)
+    j1 = store.create("bin", client_ip="10.0.0.1")
+    store.create("bin", client_ip="10.0.0.1")
+
+    store.set_failed(j1.job_id, "boom")
+    store.set_failed(j1.job_id, "boom again")  # no double decrement
+    assert store.active_count() == 1
+    assert store.active_count(client_ip="10.0.0.1") == 1
+
+    with patch("gridfinity_server.job_store.time") as mock_time:
+        mock_time.time.return_value = time.time() + 2
+        assert store.active_count() == 0
+        assert store.active_count(client_ip="10.0.0.1") == 0
+
+
+def test_active_count_tracks_capped_jobs():
+    store = JobStore()
+    store.MAX_JOBS = 3
+    for _ in range(5):
+        store.create("bin", client_ip="10.0.0.1")
+
+    active = store.active_count()
+    with store._lock:
+        assert active == len(store._jobs)
+    assert store.active_count(client_ip="10.0.0.1") == active
+
+
 def test_purge_caps_at_max():
     store = JobStore()
     store.MAX_JOBS = 5
@@ -85,9 +113,119 @@ def test_purge_caps_at_max():
         assert len(store._jobs) <= 6  # 5 cap + 1 just added before next purge
 
 
-def test_set_complete_with_media_type():
+def test_purge_drops_oldest_first():
     store = JobStore()
+    store.MAX_JOBS = 3
+    jobs = [store.create("bin") for _ in range(5)]
+
+    # Each create() trims to MAX_JOBS before adding the new job
+    assert store.get(jobs[0].job_id) is None
+    assert all(store.get(j.job_id) is not None for j in jobs[1:])
+
+
+def test_set_complete_with_media_type(tmp_path):
+    store = JobStore(result_dir=tmp_path)
     job = store.create("plate")
     store.set_complete(job.job_id, b"zip-data", "plate.zip", "application/zip")
     fetched = store.get(job.job_id)
     assert fetched.result_media_type == "application/zip"
+
+
+def test_result_spilled_to_disk(tmp_path):
+    store = JobStore(result_dir=tmp_path)
+    job = store.create("bin")
+    store.set_complete(job.job_id, b"stl-data", "test.stl")
+
+    fetched = store.get(job.job_id)
+    assert fetched.result_path.parent == tmp_path
+    assert fetched.result_path.read_bytes() == b"stl-data"
+
+
+def test_result_file_removed_with_job(tmp_path):
+    store = JobStore(max_age_seconds=0, result_dir=tmp_path)
+    job = store.create("bin")
+    store.set_complete(job.job_id, b"stl-data", "test.stl")
+    path = job.result_path
+    assert path.exists()
+
+    time.sleep(0.01)
+    assert store.get(job.job_id) is None
+    assert not path.exists()
+
+
+def test_set_complete_after_job_evicted_leaves_no_file(tmp_path):
+    store = JobStore(result_dir=tmp_path)
+    store.set_complete("gone", b"stl-data", "test.stl")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_set_complete_adopts_result_path(tmp_path):
+    store = JobStore(max_age_seconds=0, result_dir=tmp_path / "unused")
+    path = tmp_path / "plate.3mf"
+    path.write_bytes(b"3mf-data")
+    job = store.create("plate-3mf")
+    store.set_complete(job.job_id, None, "plate.3mf", "model/3mf", result_path=path)
+    assert job.result_path == path
+    assert job.result_bytes == b"3mf-data"
+
+    time.sleep(0.01)
+    assert store.get(job.job_id) is None
+    assert not path.exists()
+
+
+def test_create_complete_is_finished_and_inactive(tmp_path):
+    store = JobStore(result_dir=tmp_path)
+    job = store.create_complete("bin", "10.0.0.1", b"stl-data", "test.stl")
+
+    fetched = store.get(job.job_id)
+    assert fetched.status == JobStatus.COMPLETE
+    assert fetched.result_bytes == b"stl-data"
+    assert fetched.result_filename == "test.stl"
+    assert fetched.result_media_type == "application/octet-stream"
+    assert store.active_count() == 0
+    assert store.active_count("10.0.0.1") == 0
+
+
+def test_reset_clears_jobs_and_counts(tmp_path):
+    store = JobStore(result_dir=tmp_path)
+    done = store.create("bin", client_ip="a")
+    store.set_complete(done.job_id, b"stl-data", "test.stl")
+    pending = store.create("bin", client_ip="a")
+
+    store.reset()
+
+    assert store.get(done.job_id) is None
+    assert store.get(pending.job_id) is None
+    assert store.active_count() == 0
+    assert store.active_count("a") == 0
+    assert list(tmp_path.iterdir()) == []
+    store.create("bin", client_ip="a")
+    assert store.active_count("a") == 1
+
+
+def test_close_removes_private_result_dir():
+    store = JobStore()
+    job = store.create("bin")
+    store.set_complete(job.job_id, b"stl-data", "test.stl")
+    result_dir = store.result_dir
+    assert result_dir.name.startswith("gridfinity-")
+    (result_dir / "orphan.3mf").write_bytes(b"unclaimed")
+
+    store.close()
+
+    assert not result_dir.exists()
+    assert store.get(job.job_id) is None
+    late = store.create("bin")
+    store.set_complete(late.job_id, b"stl-data", "late.stl")
+    assert not result_dir.exists()
+
+
+def test_close_keeps_given_result_dir(tmp_path):
+    store = JobStore(result_dir=tmp_path)
+    job = store.create("bin")
+    store.set_complete(job.job_id, b"stl-data", "test.stl")
+
+    store.close()
+
+    assert tmp_path.is_dir()
+    assert list(tmp_path.iterdir()) == []
@@ -1,39 +1,56 @@
 from __future__ import annotations
 
+import io
+import zipfile
+from concurrent.futures import Future
+
 import pytest
-from fastapi.testclient import TestClient
 
-from gridfinity_server.main import app, job_store
+from gridfinity_server.main import job_store
+
+
+@pytest.fixture
+def cold_stl_cache(monkeypatch):
+    """Hide STLs that earlier tests cached, so submits take the queued path."""
+    from gridfinity_server import main
+    from gridfinity_server.cache import LRUCache
 
+    monkeypatch.setattr(main, "stl_cache", LRUCache())
 
-@pytest.fixture(scope="module")
-def client():
-    with TestClient(app) as c:
-        yield c
+
+def _run_and_fetch(client, worker_pool, job_id: str) -> dict:
+    worker_pool.run_jobs()
+    resp = client.get(f"/api/jobs/{job_id}")
+    assert resp.status_code == 200
+    return resp.json()
 
 
-def test_submit_bin_job(client):
+def test_submit_bin_job(client, worker_pool, cold_stl_cache):
     resp = client.post(
         "/api/jobs/bin",
         json={"width": 2, "depth": 1, "height": 3},
     )
-    assert resp.status_code in (200, 202)
+    assert resp.status_code == 202
     data = resp.json()
-    assert "jobId" in data
-    assert data["status"] in ("pending", "running", "complete")
+    assert data["status"] == "pending"
 
+    assert _run_and_fetch(client, worker_pool, data["jobId"])["status"] == "complete"
+    assert job_store.get(data["jobId"]).result_bytes == b"fake-stl"
 
-def test_submit_baseplate_job(client):
+
+def test_submit_baseplate_job(client, worker_pool, cold_stl_cache):
     resp = client.post(
         "/api/jobs/baseplate",
         json={"gridWidth": 3, "gridDepth": 3},
     )
-    assert resp.status_code in (200, 202)
+    assert resp.status_code == 202
     data = resp.json()
-    assert "jobId" in data
+    assert data["status"] == "pending"
+
+    assert _run_and_fetch(client, worker_pool, data["jobId"])["status"] == "complete"
 
 
-def test_submit_plate_job(client):
+def test_submit_plate_job(client, worker_pool):
     resp = client.post(
         "/api/jobs/plate",
         json={
@@ -47,9 +64,13 @@ def test_submit_plate_job(client):
             ],
         },
     )
-    assert resp.status_code in (200, 202)
+    assert resp.status_code == 202
     data = resp.json()
-    assert "jobId" in data
+    assert data["status"] == "pending"
+
+    assert _run_and_fetch(client, worker_pool, data["jobId"])["status"] == "complete"
+    with zipfile.ZipFile(job_store.get(data["jobId"]).result_path) as zf:
+        assert zf.read("bin-1x1x2-hollow-0.stl") == b"fake-stl"
 
 
 def test_invalid_request_returns_422(client):
@@ -65,19 +86,19 @@ def test_job_status_not_found(client):
     assert resp.status_code == 404
 
 
-def test_job_status_complete(client):
-    job = job_store.create("bin", client_ip="test")
-    job_store.set_complete(job.job_id, b"fake-stl-data", "test.stl")
+def test_job_status_complete(client, test_ip):
+    job = job_store.create_complete("bin", test_ip, b"fake-stl-data", "test.stl")
 
     resp = client.get(f"/api/jobs/{job.job_id}")
     assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
     data = resp.json()
     assert data["status"] == "complete"
     assert "resultUrl" in data
 
 
-def test_job_status_failed(client):
-    job = job_store.create("bin", client_ip="test")
+def test_job_status_failed(client, test_ip):
+    job = job_store.create("bin", client_ip=test_ip)
     job_store.set_failed(job.job_id, "Something broke")
 
     resp = client.get(f"/api/jobs/{job.job_id}")
@@ -92,15 +113,14 @@ def test_job_result_not_found(client):
     assert resp.status_code == 404
 
 
-def test_job_result_not_complete(client):
-    job = job_store.create("bin", client_ip="test")
+def test_job_result_not_complete(client, test_ip):
+    job = job_store.create("bin", client_ip=test_ip)
     resp = client.get(f"/api/jobs/{job.job_id}/result")
     assert resp.status_code == 409
 
 
-def test_job_result_download(client):
-    job = job_store.create("bin", client_ip="test")
-    job_store.set_complete(job.job_id, b"fake-stl-data", "test.stl")
+def test_job_result_download(client, test_ip):
+    job = job_store.create_complete("bin", test_ip, b"fake-stl-data", "test.stl")
 
     resp = client.get(f"/api/jobs/{job.job_id}/result")
     assert resp.status_code == 200
@@ -110,19 +130,142 @@ def test_job_result_download(client):
 
 def test_cache_hit_returns_200(client):
     from gridfinity_server.cache import stl_cache
-    from gridfinity_server.main import _cache_key
+    from gridfinity_server.main import _cache_key_from_dict
     from gridfinity_server.schemas import BinRequest
 
-    req = BinRequest(width=1, depth=1, height=1)
-    key = _cache_key("bin", req)
-    stl_cache.set(key, b"cached-stl")
+    # Valid by construction, so skip validation when deriving the key
+    fields = dict(BinRequest.model_construct(width=1, depth=1, height=1))
+    stl_cache.set(_cache_key_from_dict("bin", fields), b"cached-stl")
 
     resp = client.post(
         "/api/jobs/bin",
         json={"width": 1, "depth": 1, "height": 1},
     )
     assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
     data = resp.json()
     assert data["status"] == "complete"
+    assert job_store.get(data["jobId"]) is not None
 
     stl_cache.clear()
+
+
+def test_submitted_params_rebuild_without_validation():
+    import pickle
+
+    from gridfinity_server.schemas import BinRequest, Dividers
+
+    req = BinRequest(width=2, depth=1, height=3, label="M3", dividers=Dividers(vertical=2))
+    params = pickle.loads(pickle.dumps(dict(req)))  # as sent to the worker
+
+    rebuilt = BinRequest.model_construct(**params)
+    assert rebuilt == req
+    assert rebuilt.dividers.vertical == 2
+
+
+@pytest.mark.parametrize(
+    ("level", "compress_type"),
+    [(0, zipfile.ZIP_STORED), (1, zipfile.ZIP_DEFLATED)],
+)
+def test_plate_worker_zip_level(monkeypatch, level, compress_type):
+    from gridfinity_server import generators
+    from gridfinity_server.worker import _generate_plate_in_worker
+
+    monkeypatch.setattr(generators, "generate_bin_stl", lambda req: b"\0" * 1000)
+    data, fname, media_type = _generate_plate_in_worker(
+        {
+            "name": "levels",
+            "items": [{"item_type": "bin", "bin_data": {"width": 1, "depth": 1, "height": 2}}],
+        },
+        zip_level=level,
+    )
+
+    assert fname == "levels.zip"
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        (info,) = zf.infolist()
+        assert info.compress_type == compress_type
+        assert zf.read(info) == b"\0" * 1000
+
+
+def test_pool_passes_its_config_to_jobs(tmp_path):
+    from gridfinity_server.config import ServerConfig
+    from gridfinity_server.job_store import JobStore
+    from gridfinity_server.worker import WorkerPool
+
+    config = ServerConfig(
+        worker_pool_size=1,
+        rate_limit_enabled=False,
+        rate_limit_per_ip_per_minute=10,
+        rate_limit_concurrent_jobs=4,
+        rate_limit_daily_total=500,
+        job_max_age_seconds=3600,
+        plate_zip_level=0,
+        threemf_dedup_geometry=False,
+    )
+    submitted = []
+
+    class _Recorder:
+        def submit(self, fn, *args):
+            submitted.append(fn.keywords)
+            return Future()
+
+    pool = WorkerPool(config, JobStore(result_dir=tmp_path))
+    pool._executor = pool._threads = _Recorder()
+    pool.submit_plate("p", {"items": []})
+    pool.submit_plate_3mf("m", {"items": []})
+
+    assert submitted == [
+        {"zip_level": 0},
+        {"result_dir": tmp_path, "dedup_geometry": False},
+    ]
+
+
+def test_3mf_worker_reuses_cached_mesh(monkeypatch, tmp_path):
+    from gridfinity_server import generators, worker
+    from gridfinity_server.cache import LRUCache
+
+    calls = []
+
+    def fake_generate(req):
+        calls.append(req)
+        return b"stl"
+
+    monkeypatch.setattr(generators, "generate_bin_stl", fake_generate)
+    monkeypatch.setattr(
+        generators,
+        "parse_stl_to_mesh",
+        lambda stl: ([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], [(0, 1, 2)]),
+    )
+    monkeypatch.setattr(worker, "mesh_cache", LRUCache())
+    monkeypatch.setattr(worker, "stl_cache", LRUCache())
+    item = {"item_type": "bin", "bin_data": {"width": 1, "depth": 1, "height": 2}}
+    params = {"name": "again", "items": [item, item]}
+
+    first, _, _ = worker._generate_3mf_in_worker(params, tmp_path, dedup_geometry=True)
+    second, _, _ = worker._generate_3mf_in_worker(params, tmp_path, dedup_geometry=True)
+    assert first.parent == second.parent == tmp_path
+    assert len(calls) == 1
+    with zipfile.ZipFile(first) as a, zipfile.ZipFile(second) as b:
+        assert a.read("3D/3dmodel.model") == b.read("3D/3dmodel.model")
+
+
+def test_3mf_job_runs_inline_when_items_cached(monkeypatch):
+    from gridfinity_server import worker
+    from gridfinity_server.cache import LRUCache
+    from gridfinity_server.main import _cache_key
+    from gridfinity_server.schemas import BinRequest
+
+    monkeypatch.setattr(worker, "mesh_cache", LRUCache())
+    monkeypatch.setattr(worker, "stl_cache", LRUCache())
+    bin_data = {"width": 1, "depth": 1, "height": 2}
+    params = {
+        "name": "inline",
+        "items": [{"item_type": "bin", "bin_data": bin_data, "x_mm": 0, "y_mm": 0}],
+    }
+    assert not worker.WorkerPool._should_inline(params)
+
+    worker.stl_cache.set(_cache_key("bin", BinRequest(**bin_data)), b"stl")
+    assert worker.WorkerPool._should_inline(params)
+
+    bad = {"items": [{"item_type": "bin", "bin_data": {"width": -1}}]}
+    assert not worker.WorkerPool._should_inline(bad)
@@ -1,23 +1,47 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import time
+from collections import deque
+from unittest.mock import patch
+
 import pytest
-from httpx import ASGITransport, AsyncClient
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
 
 from gridfinity_server.config import ServerConfig
 from gridfinity_server.job_store import JobStore
 from gridfinity_server.rate_limit import RateLimitMiddleware
 
-# Minimal FastAPI app for testing the middleware in isolation
-from fastapi import FastAPI
+
+@pytest.fixture(scope="session")
+def job_store():
+    store = JobStore()
+    yield store
+    store.close()
+
+
+@pytest.fixture(autouse=True)
+def _empty_job_store(job_store):
+    job_store.reset()
 
 
-def _make_app(
-    per_ip_per_minute: int = 3,
+def _middleware(job_store: JobStore, **limits) -> RateLimitMiddleware:
+    """RateLimitMiddleware over the stub app; ``limits`` are _config's arguments."""
+    return RateLimitMiddleware(_stub_app, config=_config(**limits), job_store=job_store)
+
+
+@functools.lru_cache(maxsize=32)
+def _config(
+    per_ip_per_minute: int = 10,
     daily_total: int = 100,
     concurrent_jobs: int = 10,
     enabled: bool = True,
-) -> FastAPI:
-    config = ServerConfig(
+) -> ServerConfig:
+    # ServerConfig is frozen, so scenarios with the same limits can share one
+    return ServerConfig(
         worker_pool_size=1,
         rate_limit_enabled=enabled,
         rate_limit_per_ip_per_minute=per_ip_per_minute,
@@ -25,97 +49,170 @@ def _make_app(
         rate_limit_daily_total=daily_total,
         job_max_age_seconds=3600,
     )
-    job_store = JobStore()
-    app = FastAPI()
-    app.add_middleware(RateLimitMiddleware, config=config, job_store=job_store)
 
-    @app.post("/api/jobs/bin")
-    async def submit_job():
-        return {"status": "ok"}
 
-    @app.get("/api/health")
-    async def health():
-        return {"status": "ok"}
+async def _stub_app(scope, receive, send):
+    """Downstream ASGI app that accepts every request, so the middleware is tested alone."""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
 
-    return app
 
+POST_JOB = ("POST", "/api/jobs/bin")
+GET_HEALTH = ("GET", "/api/health")
 
-@pytest.mark.asyncio
-async def test_rate_limit_per_ip():
-    app = _make_app(per_ip_per_minute=3)
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"
-    ) as client:
-        for _ in range(3):
-            resp = await client.post("/api/jobs/bin")
-            assert resp.status_code == 200
 
-        resp = await client.post("/api/jobs/bin")
-        assert resp.status_code == 429
-        assert "Retry-After" in resp.headers
+async def _call(
+    app, method: str, path: str, client_ip: str = "127.0.0.1"
+) -> tuple[int, Headers]:
+    """Drive one bodiless request through ``app`` as raw ASGI; return (status, headers)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": (client_ip, 0),
+        "server": ("test", 80),
+    }
+    start = {}
 
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
 
-@pytest.mark.asyncio
-async def test_rate_limit_daily():
-    app = _make_app(daily_total=2, per_ip_per_minute=100)
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"
-    ) as client:
-        for _ in range(2):
-            resp = await client.post("/api/jobs/bin")
-            assert resp.status_code == 200
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
 
-        resp = await client.post("/api/jobs/bin")
-        assert resp.status_code == 429
+    await app(scope, receive, send)
+    return start["status"], Headers(raw=start.get("headers", []))
 
 
 @pytest.mark.asyncio
-async def test_rate_limit_disabled():
-    app = _make_app(per_ip_per_minute=1, enabled=False)
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"
-    ) as client:
-        for _ in range(5):
-            resp = await client.post("/api/jobs/bin")
-            assert resp.status_code == 200
+@pytest.mark.parametrize(
+    ("limits", "active_jobs", "requests", "expected"),
+    [
+        pytest.param(
+            {"per_ip_per_minute": 3}, 0, [POST_JOB] * 4, [200, 200, 200, 429],
+            id="per-ip",
+        ),
+        pytest.param(
+            {"per_ip_per_minute": 0}, 0, [POST_JOB] * 2, [429, 429],
+            id="per-ip-zero",
+        ),
+        pytest.param(
+            {"daily_total": 2, "per_ip_per_minute": 100}, 0, [POST_JOB] * 3,
+            [200, 200, 429], id="daily",
+        ),
+        pytest.param(
+            {"per_ip_per_minute": 1, "enabled": False}, 0, [POST_JOB] * 5,
+            [200] * 5, id="disabled",
+        ),
+        # GET requests should not be rate limited
+        pytest.param(
+            {"per_ip_per_minute": 1}, 0, [GET_HEALTH] * 5, [200] * 5,
+            id="skips-non-post",
+        ),
+        # Other clients' pending jobs count towards the global limit
+        pytest.param(
+            {"per_ip_per_minute": 100, "concurrent_jobs": 2, "daily_total": 500},
+            2, [POST_JOB], [429], id="concurrent-jobs",
+        ),
+    ],
+)
+async def test_rate_limits(job_store, limits, active_jobs, requests, expected):
+    for _ in range(active_jobs):
+        job_store.create("bin", client_ip="other")
+    app = _middleware(job_store, **limits)
+
+    # The admitted prefix commutes within one window, so send it at once;
+    # requests from the first rejection on go one by one, in order.
+    allowed = expected.index(429) if 429 in expected else len(expected)
+    responses = list(await asyncio.gather(
+        *(_call(app, method, path) for method, path in requests[:allowed])
+    ))
+    for method, path in requests[allowed:]:
+        responses.append(await _call(app, method, path))
+
+    assert [status for status, _ in responses] == expected
+    for status, headers in responses[allowed:]:
+        if status == 429:
+            assert "Retry-After" in headers
 
 
 @pytest.mark.asyncio
-async def test_rate_limit_skips_non_post():
-    app = _make_app(per_ip_per_minute=1)
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"
-    ) as client:
-        # GET requests should not be rate limited
-        for _ in range(5):
-            resp = await client.get("/api/health")
-            assert resp.status_code == 200
+async def test_rate_limit_window_slides(job_store):
+    app = _middleware(job_store, per_ip_per_minute=1)
+    status, _ = await _call(app, *POST_JOB)
+    assert status == 200
+
+    with patch("gridfinity_server.rate_limit.time") as mock_time:
+        mock_time.time.return_value = time.time() + 61
+        status, _ = await _call(app, *POST_JOB)
+        assert status == 200
+
+
+def test_sweep_drops_idle_ips(job_store):
+    mw = _middleware(job_store)
+    mw._ip_hits["idle"] = deque([10.0])
+    mw._ip_hits["empty"] = deque()
+    mw._ip_hits["active"] = deque([10.0, 150.0])
+
+    mw._sweep_idle_ips(window_start=100.0)
+
+    assert set(mw._ip_hits) == {"active"}
+
+
+def _job_post(client_ip: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/jobs/bin",
+        "headers": [],
+        "query_string": b"",
+        "client": (client_ip, 1234),
+        "server": ("test", 80),
+        "scheme": "http",
+    })
+
+
+async def _ok(_request):
+    return Response(status_code=200)
 
 
 @pytest.mark.asyncio
-async def test_rate_limit_concurrent_jobs():
-    config = ServerConfig(
-        worker_pool_size=1,
-        rate_limit_enabled=True,
-        rate_limit_per_ip_per_minute=100,
-        rate_limit_concurrent_jobs=2,
-        rate_limit_daily_total=500,
-        job_max_age_seconds=3600,
-    )
-    job_store = JobStore()
-    # Pre-fill active jobs
-    job_store.create("bin", client_ip="other")
-    job_store.create("bin", client_ip="other")
+async def test_sweep_runs_on_minute_rollover(job_store):
+    mw = _middleware(job_store)
+    now = time.time()
+    mw._ip_hits["idle"] = deque([now - 120])
+    mw._sweep_bucket = int(now // 60)
+
+    with patch("gridfinity_server.rate_limit.time") as mock_time:
+        # Same minute: no sweep yet
+        mock_time.time.return_value = now
+        await mw.dispatch(_job_post("10.0.0.1"), _ok)
+        assert set(mw._ip_hits) == {"idle", "10.0.0.1"}
+
+        # Next minute: the idle IP is dropped
+        mock_time.time.return_value = now + 60
+        await mw.dispatch(_job_post("10.0.0.1"), _ok)
+        assert set(mw._ip_hits) == {"10.0.0.1"}
 
-    app = FastAPI()
-    app.add_middleware(RateLimitMiddleware, config=config, job_store=job_store)
 
-    @app.post("/api/jobs/bin")
-    async def submit_job():
-        return {"status": "ok"}
+@pytest.mark.asyncio
+async def test_rejected_request_does_not_track_new_ip(job_store):
+    job_store.create("bin", client_ip="other")
+    mw = _middleware(job_store, concurrent_jobs=1)
+
+    resp = await mw.dispatch(_job_post("10.0.0.1"), _ok)
 
-    async with AsyncClient(
-        transport=ASGITransport(app=app), base_url="http://test"
-    ) as client:
-        resp = await client.post("/api/jobs/bin")
-        assert resp.status_code == 429
+    assert resp.status_code == 429
+    assert mw._ip_hits == {}
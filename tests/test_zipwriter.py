@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from gridfinity_server import zipwriter
+from gridfinity_server.zipwriter import ZipBuilder
+
+ENTRIES = [
+    ("model.xml", b"<vertex x=\"1.0000\" />" * 500),
+    ("empty.txt", b""),
+    ("bin-größe.stl", bytes(range(256)) * 4),
+]
+
+
+@pytest.fixture(params=["libdeflate", "zlib"])
+def backend(request, monkeypatch):
+    if request.param == "libdeflate":
+        if zipwriter.deflate is None:
+            pytest.skip("deflate not installed")
+    else:
+        monkeypatch.setattr(zipwriter, "deflate", None)
+    return request.param
+
+
+@pytest.mark.parametrize(
+    ("level", "compress_type"),
+    [(0, zipfile.ZIP_STORED), (1, zipfile.ZIP_DEFLATED), (6, zipfile.ZIP_DEFLATED)],
+)
+def test_round_trip(backend, level, compress_type):
+    archive = ZipBuilder(level)
+    for name, data in ENTRIES:
+        archive.add(name, data)
+
+    with zipfile.ZipFile(BytesIO(archive.getvalue())) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [name for name, _ in ENTRIES]
+        for (name, data), info in zip(ENTRIES, zf.infolist()):
+            assert info.compress_type == compress_type
+            assert zf.read(name) == data
+
+
+def test_empty_archive(backend):
+    with zipfile.ZipFile(BytesIO(ZipBuilder().getvalue())) as zf:
+        assert zf.namelist() == []
+
+
+def test_compresses_repetitive_data(backend):
+    archive = ZipBuilder(6)
+    archive.add("model.xml", ENTRIES[0][1])
+    with zipfile.ZipFile(BytesIO(archive.getvalue())) as zf:
+        info = zf.getinfo("model.xml")
+        assert info.compress_size < info.file_size // 10
+
+
+@pytest.mark.parametrize("level", [0, 6])
+def test_streams_to_file(backend, level, tmp_path):
+    path = tmp_path / "out.zip"
+    with open(path, "wb") as out:
+        archive = ZipBuilder(level, out)
+        for name, data in ENTRIES:
+            archive.add(name, data)
+        archive.close()
+
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert [zf.read(name) for name, _ in ENTRIES] == [data for _, data in ENTRIES]